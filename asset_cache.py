@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Default number of bytes of pixels the process-wide cache keeps.
+ASSET_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _nbytes(value):
+    """Counts the bytes of the arrays in a value, however nested."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+
+    return 0
+
+
+def file_key(path):
+    """Identifies a file as it is now, so its assets are loaded again once
+    it's modified. Stat the file once and reuse the key for every lookup.
+
+    Arguments:
+        path: Path of the file.
+
+    Return:
+        Absolute path and modification time of the file.
+    """
+    return os.path.abspath(path), os.path.getmtime(path)
+
+
+class AssetCache:
+    def __init__(self, max_bytes=ASSET_CACHE_BYTES):
+        """Initializes a cache of decoded images and their variants, shared by
+        every float image and evicting the least recently used ones past a
+        byte budget.
+
+        Cached arrays are shared, so they must never be modified.
+
+        Arguments:
+            max_bytes: Maximum number of bytes of pixels to keep.
+        """
+        self._max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, file, variant, load):
+        """Gets an asset of a file, loading it if it isn't cached.
+
+        Looking an asset up never touches the disk.
+
+        Arguments:
+            file: Key of the file the asset comes from, see file_key().
+            variant: Hashable description of the asset, such as its size.
+            load: Callable loading the asset when it isn't cached.
+
+        Return:
+            Asset.
+        """
+        key = (file, variant)
+
+        with self._lock:
+            item = self._items.get(key)
+
+            if item is not None:
+                self._items.move_to_end(key)
+                self._hits += 1
+                return item[0]
+
+            self._misses += 1
+
+        # Loading can take a while, so it happens outside the lock; two
+        # threads loading the same asset at once just both load it.
+        value = load()
+        size = _nbytes(value)
+
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = (value, size)
+                self._bytes += size
+
+            while self._bytes > self._max_bytes and self._items:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """Gets the cache's counters.
+
+        Return:
+            Dictionary of the hits, misses, evictions, number of cached
+            assets, their bytes and the byte budget.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def get_max_bytes(self):
+        return self._max_bytes
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self._max_bytes = max_bytes
+
+
+# Cache shared by the whole process.
+asset_cache = AssetCache()
@@ -0,0 +1,85 @@
+"""Measures the startup time and resident memory of each GestureClassifier backend.
+
+Each backend is loaded in a fresh interpreter so that the import cost is
+measured from scratch.
+
+Usage:
+    python benchmarks/startup.py [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+
+from gesture_classfier import GestureClassifier
+
+classifier = GestureClassifier(backend=sys.argv[1])
+classifier([0.0] * 42)
+
+elapsed = time.perf_counter() - start
+
+try:
+    import psutil
+
+    rss = psutil.Process().memory_info().rss
+except ImportError:
+    import resource
+
+    # Peak RSS is reported in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        rss *= 1024
+
+print(json.dumps({"seconds": elapsed, "rss_mb": rss / 2**20}))
+"""
+
+
+def measure(backend, runs):
+    results = []
+
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE, backend],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+
+        if proc.returncode != 0:
+            return None
+
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    # Report the best run; the slower ones are usually cold caches.
+    return min(results, key=lambda result: result["seconds"])
+
+
+def main():
+    from gesture_classfier import BACKENDS
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"{'backend':<16}{'startup (s)':>12}{'RSS (MB)':>12}")
+
+    for backend in BACKENDS:
+        result = measure(backend, runs)
+
+        if result is None:
+            print(f"{backend:<16}{'not installed':>24}")
+            continue
+
+        print(f"{backend:<16}{result['seconds']:>12.3f}{result['rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    main()
@@ -1,24 +1,291 @@
+import os
+import threading
+import time
 import cv2 as cv
+import numpy as np
+from frame_sources import ImageSequenceSource, SyntheticSource
+
+
+def mirror_to_rgb(frame):
+    """Mirrors a captured BGR frame and converts it to RGB in one pass.
+
+    Arguments:
+        frame: Captured BGR frame, converted in place.
+
+    Return:
+        Mirrored RGB frame.
+    """
+    h, w, c = frame.shape
+    frame = np.ascontiguousarray(frame)
+
+    # Flipping each row as a flat run of bytes reverses both the pixel
+    # order and the channel order, so BGR becomes mirrored RGB in one pass.
+    # Each captured frame is a new array, so this can be done in place.
+    cv.flip(frame.reshape(h, w * c), 1, dst=frame.reshape(h, w * c))
+
+    return frame
+
 
 class Capture:
-    def __init__(self, cap_src=0):
-        self._cap = cv.VideoCapture(cap_src)
+    def __init__(
+        self,
+        cap_src=0,
+        threaded=False,
+        stale_timeout=1.0,
+        width=None,
+        height=None,
+        fps=None,
+        realtime=True,
+        loop=False,
+    ):
+        """Initializes a capture source.
+
+        Arguments:
+            cap_src: Capture source: a camera index, a video file or stream
+            URL, a directory or glob pattern of images, "synthetic" for
+            generated frames of a rendered hand, or an object that reads
+            like cv.VideoCapture.
+            threaded: Read frames on a background thread, keeping only the
+            newest one so that read() never waits for the camera.
+            stale_timeout: Seconds without a new frame before a threaded
+            capture reports failure.
+            width: Requested frame width, or None for the camera's default.
+            height: Requested frame height, or None for the camera's default.
+            fps: Requested frame rate, or None for the camera's default.
+            realtime: Play recorded sources back at their frame rate rather
+            than as fast as they're read; in threaded mode, as fast as
+            possible still never skips a frame.
+            loop: Start recorded sources over when they end.
+        """
+        self._cap = self._open(cap_src, width, height, fps)
+
+        # Cameras and streams set their own pace; recorded sources end.
+        self._recorded = not (
+            isinstance(cap_src, int)
+            or (isinstance(cap_src, str) and "://" in cap_src)
+        )
+        self._realtime = realtime
+        self._loop = loop
+        self._ended = False
+        self._play_start = None
+        self._play_index = 0
+
+        # Cameras pick the closest mode they support; the getters report it.
+        for prop, value in (
+            (cv.CAP_PROP_FRAME_WIDTH, width),
+            (cv.CAP_PROP_FRAME_HEIGHT, height),
+            (cv.CAP_PROP_FPS, fps),
+        ):
+            if value is not None:
+                self._cap.set(prop, value)
+
         self._success = False
+        self._threaded = threaded
+        self._stale_timeout = stale_timeout
+
+        # Latest-frame slot, only used in threaded mode.
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._first_frame = threading.Event()
+        self._running = False
+        self._thread = None
+        self._frame = None
+        self._frame_seq = 0
+        self._frame_time = 0.0
+        self._read_seq = 0
+        self._read_time = 0.0
+
+        if self._threaded and self._cap.isOpened():
+            self._running = True
+            self._thread = threading.Thread(target=self._reader, daemon=True)
+            self._thread.start()
+
+            # Wait for the first frame so the caller doesn't mistake a
+            # warming-up camera for a missing one.
+            self._first_frame.wait(self._stale_timeout)
 
     def __del__(self):
-        if self._cap.isOpened():
-            self._cap.release()
+        self.release()
 
-    def read(self) :
+    def _open(self, cap_src, width, height, fps):
+        if not isinstance(cap_src, (int, str)):
+            return cap_src
+
+        if cap_src == "synthetic":
+            # Its size is fixed once its background is drawn.
+            size = dict(width=width, height=height, fps=fps)
+            return SyntheticSource(
+                **{name: value for name, value in size.items() if value is not None}
+            )
+
+        if isinstance(cap_src, str) and (os.path.isdir(cap_src) or "*" in cap_src):
+            return ImageSequenceSource(cap_src)
+
+        return cv.VideoCapture(cap_src)
+
+    def _next_frame(self):
+        """Reads the source's next frame, pacing and looping recorded
+        sources."""
         success, frame = self._cap.read()
-        
-        self._success = success
+
+        if not self._recorded:
+            return success, frame
+
+        if not success and self._loop and self._play_index > 0:
+            self._cap.set(cv.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self._cap.read()
+
+        if not success:
+            self._ended = True
+            return success, frame
+
+        if self._realtime:
+            fps = self._cap.get(cv.CAP_PROP_FPS) or 30
+            now = time.perf_counter()
+
+            if self._play_start is None:
+                self._play_start = now
+
+            delay = self._play_start + self._play_index / fps - now
+
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Too far behind to catch up; restart the clock instead.
+                self._play_start = now - self._play_index / fps
+
+        self._play_index += 1
 
         return success, frame
 
+    def _reader(self):
+        while self._running:
+            if self._recorded and not self._realtime:
+                # As fast as possible, but every frame gets read.
+                with self._new_frame:
+                    self._new_frame.wait_for(
+                        lambda: self._frame_seq == self._read_seq
+                        or not self._running
+                    )
+
+                if not self._running:
+                    break
+
+            success, frame = self._next_frame()
+
+            if self._ended:
+                with self._lock:
+                    self._running = False
+                    self._new_frame.notify_all()
+
+                self._first_frame.set()
+                break
+
+            if not success:
+                # Driver hiccup; keep serving the last good frame until
+                # it goes stale.
+                time.sleep(0.005)
+                continue
+
+            with self._lock:
+                self._frame = frame
+                self._frame_seq += 1
+                self._frame_time = time.perf_counter()
+                self._new_frame.notify_all()
+
+            self._first_frame.set()
+
+    def read(self):
+        if not self._threaded:
+            success, frame = self._next_frame()
+
+            self._success = success
+
+            return success, frame
+
+        with self._lock:
+            frame = self._frame
+            new = self._read_seq != self._frame_seq
+            self._read_seq = self._frame_seq
+            self._read_time = self._frame_time
+            self._new_frame.notify_all()
+
+        # The last frame of an ended source stays valid until it's read.
+        self._success = frame is not None and (
+            (self._ended and new)
+            or time.perf_counter() - self._read_time < self._stale_timeout
+        )
+
+        return self._success, frame
+
+    def has_new_frame(self):
+        """Whether a frame newer than the last read one is available."""
+        if not self._threaded:
+            return True
+
+        return self._frame_seq != self._read_seq
+
+    def wait_new_frame(self, timeout=None):
+        """Waits for a frame newer than the last read one.
+
+        Arguments:
+            timeout: Maximum number of seconds to wait.
+
+        Return:
+            Whether a new frame is available.
+        """
+        if not self._threaded:
+            return self._cap.isOpened() and not self._ended
+
+        with self._new_frame:
+            self._new_frame.wait_for(
+                lambda: self._frame_seq != self._read_seq or not self._running,
+                timeout,
+            )
+
+            # An ended source still has its last frame to give.
+            return self._frame_seq != self._read_seq and (
+                self._running or self._ended
+            )
+
+    def release(self):
+        with self._lock:
+            self._running = False
+            self._new_frame.notify_all()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+        if self._cap.isOpened():
+            self._cap.release()
+
+    def is_ended(self):
+        """Whether a recorded source has run out of frames."""
+        return self._ended
+
+    def get_source(self):
+        """Gets the object frames are read from, such as a cv.VideoCapture."""
+        return self._cap
+
+    def is_threaded(self):
+        return self._threaded
+
+    def is_recorded(self):
+        return self._recorded
+
+    def is_realtime(self):
+        return self._realtime
+
     def get_success(self):
         return self._success
 
+    def get_frame_seq(self):
+        return self._read_seq
+
+    def get_frame_time(self):
+        return self._read_time
+
     def get_width(self):
         return int(self._cap.get(cv.CAP_PROP_FRAME_WIDTH))
 
@@ -0,0 +1,268 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2 as cv
+import numpy as np
+
+# Number of blended pixels below which a frame is blended serially, since
+# handing it to the workers would cost more than it saves.
+PARALLEL_MIN_PIXELS = 256 * 256
+
+# Maximum number of workers used when the count isn't given.
+MAX_WORKERS = 8
+
+
+class Compositor:
+    def __init__(self, workers=None):
+        """Initializes a compositor that blends float images onto frames.
+
+        Float images are stored premultiplied, so a blend only touches the
+        pixels under the image's rectangle and needs no full-frame temporaries.
+
+        The images that aren't being dragged are flattened into a cached
+        premultiplied layer, rebuilt only where the scene changed, so each
+        frame blends that layer once plus the few images being dragged.
+
+        Large blends are split into horizontal tiles blended on a pool of
+        worker threads; OpenCV releases the GIL while it blends.
+
+        Arguments:
+            workers: Number of worker threads, None for one per core, or 1 to
+            blend serially.
+        """
+        if workers is None:
+            workers = min(os.cpu_count() or 1, MAX_WORKERS)
+
+        self._workers = max(workers, 1)
+        self._pool = (
+            ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="blend")
+            if self._workers > 1
+            else None
+        )
+
+        # Premultiplied RGB of the static images and their combined inverted
+        # alpha, the size of the frame, and the rectangles they cover; only
+        # those are blended, so the cost follows the images' area.
+        self._layer = None
+        self._layer_alpha_inv = None
+        self._layer_rects = []
+
+    def draw_scene(self, frame, scene):
+        """Blends a scene's float images onto a frame, in place.
+
+        Arguments:
+            frame: RGB frame to draw on.
+            scene: Scene of the float images.
+
+        Return:
+            Frame with the float images drawn on it.
+        """
+        frame_h, frame_w = frame.shape[:2]
+
+        if self._layer is None or self._layer.shape[:2] != (frame_h, frame_w):
+            self._layer = np.zeros((frame_h, frame_w, 3), dtype=np.uint8)
+            self._layer_alpha_inv = np.full(
+                (frame_h, frame_w, 3), 255, dtype=np.uint8
+            )
+            scene.pop_dirty()
+            dirty = [(0, 0, frame_w, frame_h)]
+        else:
+            dirty = scene.pop_dirty()
+
+        if dirty:
+            for rect in dirty:
+                self._rebuild(scene, rect)
+
+            self._layer_rects = scene.get_static_rects()
+
+        # Blends (img, alpha_inv, rect) in the order they're applied.
+        blends = []
+
+        # The rectangles don't overlap, so their order doesn't matter.
+        for x0, y0, x1, y1 in self._layer_rects:
+            # Clip to the frame first, the layer is no larger.
+            x0, y0 = max(x0, 0), max(y0, 0)
+            x1, y1 = min(x1, frame_w), min(y1, frame_h)
+
+            if x0 < x1 and y0 < y1:
+                blends.append(
+                    (
+                        self._layer[y0:y1, x0:x1],
+                        self._layer_alpha_inv[y0:y1, x0:x1],
+                        (x0, y0, x1 - x0, y1 - y0),
+                    )
+                )
+
+        # The dragged images are on top, since dragging raises them.
+        for float_image in scene.get_dragged_images():
+            blends.append(
+                (
+                    float_image.get_img(),
+                    float_image.get_alpha_inv(),
+                    (
+                        float_image.get_pos_x(),
+                        float_image.get_pos_y(),
+                        float_image.get_width(),
+                        float_image.get_height(),
+                    ),
+                )
+            )
+
+        self._blend_all(frame, blends)
+
+        return frame
+
+    def _blend_all(self, frame, blends):
+        """Applies blends to a frame, in tiles on the workers if they're
+        large enough to be worth it.
+
+        Arguments:
+            frame: Frame to blend onto.
+            blends: (img, alpha_inv, rect) of each blend, in order.
+        """
+        pixels = sum(rect[2] * rect[3] for _, _, rect in blends)
+
+        if self._pool is None or pixels < PARALLEL_MIN_PIXELS:
+            for img, alpha_inv, rect in blends:
+                self._blend(frame, img, alpha_inv, rect)
+
+            return
+
+        # Each tile is a band of rows, so the blends within a tile keep
+        # their order and no two workers write to the same pixels.
+        frame_h = frame.shape[0]
+        tile_h = -(-frame_h // self._workers)
+
+        def blend_tile(ty):
+            tile = frame[ty : ty + tile_h]
+
+            for img, alpha_inv, (x, y, w, h) in blends:
+                self._blend(tile, img, alpha_inv, (x, y - ty, w, h))
+
+        # Raise any worker's exception here.
+        for _ in self._pool.map(blend_tile, range(0, frame_h, tile_h)):
+            pass
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def get_workers(self):
+        return self._workers
+
+    def _rebuild(self, scene, rect):
+        """Flattens the static images over a rectangle of the cached layer.
+
+        Arguments:
+            scene: Scene of the float images.
+            rect: Rectangle (x0, y0, x1, y1) to rebuild.
+        """
+        layer_h, layer_w = self._layer.shape[:2]
+        x0, y0, x1, y1 = rect
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, layer_w), min(y1, layer_h)
+
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        layer = self._layer[y0:y1, x0:x1]
+        layer_alpha_inv = self._layer_alpha_inv[y0:y1, x0:x1]
+        layer[:] = 0
+        layer_alpha_inv[:] = 255
+
+        for float_image in scene.query_rect((x0, y0, x1, y1)):
+            if scene.is_dragged(float_image):
+                continue
+
+            rect = (
+                float_image.get_pos_x() - x0,
+                float_image.get_pos_y() - y0,
+                float_image.get_width(),
+                float_image.get_height(),
+            )
+            alpha_inv = float_image.get_alpha_inv()
+
+            # Over: colour as on a frame, and the coverage accumulates as
+            # alpha_inv = alpha_inv * image_alpha_inv.
+            self._blend(layer, float_image.get_img(), alpha_inv, rect)
+
+            if alpha_inv is None:
+                self._blend(layer_alpha_inv, 0, None, rect)
+            else:
+                self._blend_alpha_inv(layer_alpha_inv, alpha_inv, rect)
+
+    def _blend_alpha_inv(self, layer_alpha_inv, alpha_inv, rect):
+        roi, alpha_inv = self._clip(layer_alpha_inv, alpha_inv, rect)
+
+        if roi is not None:
+            cv.multiply(roi, alpha_inv, dst=roi, scale=1 / 255)
+
+    def _clip(self, frame, img, rect):
+        """Clips an image's rectangle to the frame.
+
+        Return:
+            Frame's region of interest and the matching part of the image, or
+            None and None if they don't overlap.
+        """
+        frame_h, frame_w = frame.shape[:2]
+        x, y, w, h = rect
+
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+
+        if x0 >= x1 or y0 >= y1:
+            return None, None
+
+        roi = frame[y0:y1, x0:x1]
+
+        if isinstance(img, np.ndarray):
+            img = img[y0 - y : y1 - y, x0 - x : x1 - x]
+
+        return roi, img
+
+    def draw(self, frame, float_image):
+        """Blends a float image onto a frame, in place.
+
+        Arguments:
+            frame: RGB frame to draw on.
+            float_image: Float image to draw.
+
+        Return:
+            Frame with the float image drawn on it.
+        """
+        x, y = float_image.get_pos_x(), float_image.get_pos_y()
+        w, h = float_image.get_width(), float_image.get_height()
+
+        self._blend(
+            frame,
+            float_image.get_img(),
+            float_image.get_alpha_inv(),
+            (x, y, w, h),
+        )
+
+        return frame
+
+    def _blend(self, frame, img, alpha_inv, rect):
+        """Blends a premultiplied image over the frame's region of interest.
+
+        Arguments:
+            frame: Frame to blend onto.
+            img: Premultiplied RGB image, or a value to fill with.
+            alpha_inv: Inverted alpha (255 - alpha) as three channels, or None
+            for an opaque image.
+            rect: Position and size (x, y, w, h) of the image on the frame.
+        """
+        roi, img = self._clip(frame, img, rect)
+
+        if roi is None:
+            return
+
+        if alpha_inv is None:
+            roi[:] = img
+            return
+
+        _, alpha_inv = self._clip(frame, alpha_inv, rect)
+
+        # dst = src + dst * (1 - alpha)
+        cv.multiply(roi, alpha_inv, dst=roi, scale=1 / 255)
+        cv.add(roi, img, dst=roi)
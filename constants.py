@@ -5,6 +5,29 @@ WS_EX_TOOLWINDOW = 0x00000080
 CAPTURE_WIDTH = 720
 CAPTURE_HEIGHT = 405
 
+"""Pipeline"""
+PIPELINE_QUEUE_SIZE = 2
+PREVIEW_INTERVAL = 10
+
+"""Hand Detection"""
+DETECTION_WIDTH = 640
+DETECTION_ROI_TRACKING = False
+DETECTION_ADAPTIVE = True
+# Frame budgets to wait for a detector process's hands before using its most
+# recent ones, so a slow detection doesn't hold up the frame.
+DETECTION_PROCESS_LATENCY = 1.0
+
+"""Idle Mode"""
+IDLE_TIMEOUT = 5.0
+IDLE_PROBE_INTERVAL = 0.5
+
+"""Quality"""
+QUALITY_ADAPTIVE = True
+
+"""Compositing"""
+# None uses one worker per core, 1 blends serially.
+COMPOSITOR_WORKERS = None
+
 """Colors"""
 COLOR_BLACK = "#232932"
 COLOR_GRAY = "#393E46"
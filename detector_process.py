@@ -0,0 +1,276 @@
+import logging
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from hand_detector import HandDetector
+
+logger = logging.getLogger(__name__)
+
+
+def _detector_worker(conn, detector_kwargs):
+    """Runs a hand detector on frames written to a shared memory ring.
+
+    Arguments:
+        conn: Connection to the parent process.
+        detector_kwargs: Arguments of the hand detector.
+    """
+    detector = HandDetector(**detector_kwargs)
+    shm = None
+    frames = None
+
+    while True:
+        msg = conn.recv()
+
+        if msg is None:
+            break
+
+        if msg[0] == "ring":
+            _, name, shape = msg
+
+            if shm is not None:
+                shm.close()
+
+            # The parent owns the ring and unlinks it when done.
+            shm = shared_memory.SharedMemory(name=name)
+            frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            continue
+
+        if msg[0] == "config":
+            detector.configure(**msg[1])
+            continue
+
+        _, slot, seq, draw = msg
+
+        detector.reset_hands_list()
+        detector.find_hands(frames[slot], draw)
+
+        hands_list, pre_processed_hands_list = detector.get_hands()
+
+        conn.send(
+            (
+                seq,
+                [handedness for handedness, _ in hands_list],
+                detector.get_landmarks().copy(),
+                pre_processed_hands_list,
+            )
+        )
+
+    if shm is not None:
+        shm.close()
+
+
+class HandDetectorProcess:
+    # Stateless helpers shared with the in-process detector.
+    get_midpoint = HandDetector.get_midpoint
+    get_distance = HandDetector.get_distance
+
+    def __init__(self, slots=3, max_latency=None, **detector_kwargs):
+        """Initializes a hand detector that runs in a separate process.
+
+        Frames are passed to the worker through a shared memory ring buffer,
+        only the landmarks come back through a pipe. If the worker dies,
+        detection carries on in this process.
+
+        Arguments:
+            slots: Number of frames in the ring, which is also the maximum
+            number of frames being detected at once.
+            max_latency: Maximum number of seconds to wait for a frame's
+            hands, after which the most recent hands are used instead. None
+            waits for every frame.
+            detector_kwargs: Arguments of the hand detector.
+        """
+        self._slots = slots
+        self._max_latency = max_latency
+        self._detector_kwargs = detector_kwargs
+
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_detector_worker,
+            args=(child_conn, detector_kwargs),
+            daemon=True,
+        )
+        self._process.start()
+
+        self._shm = None
+        self._frames = None
+        self._seq = 0
+        self._pending = 0
+        self._results_seq = 0
+
+        # Settings are sent along with the next frame, so only the detecting
+        # thread writes to the pipe. All of them are kept for the in-process
+        # detector taking over from a dead worker.
+        self._pending_config = None
+        self._config = {}
+        self._fallback = None
+
+        self._hands_list = []
+        self._landmarks = np.zeros((0, 21, 2), dtype=np.int32)
+        self._pre_processed_hands_list = np.zeros((0, 42), dtype=np.float32)
+
+    def _ring(self, shape):
+        """(Re)creates the ring buffer for frames of the given shape."""
+        if self._frames is not None and self._frames.shape[1:] == shape:
+            return
+
+        # Wait for the frames in flight before the old ring goes away.
+        while self._pending:
+            self._receive(None)
+
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+
+        ring_shape = (self._slots,) + shape
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=int(np.prod(ring_shape))
+        )
+        self._frames = np.ndarray(ring_shape, dtype=np.uint8, buffer=self._shm.buf)
+
+        self._conn.send(("ring", self._shm.name, ring_shape))
+
+    def _receive(self, timeout):
+        """Receives the worker's replies, keeping the most recent hands.
+
+        Arguments:
+            timeout: Seconds to wait for the first reply, None to wait
+            indefinitely.
+
+        Return:
+            Whether a reply was received.
+        """
+        if not self._conn.poll(timeout):
+            return False
+
+        while True:
+            seq, handedness, landmarks, pre_processed = self._conn.recv()
+            self._pending -= 1
+
+            if seq > self._results_seq:
+                self._results_seq = seq
+                self._landmarks = landmarks
+                self._hands_list = [
+                    [label, landmarks[i]] for i, label in enumerate(handedness)
+                ]
+                self._pre_processed_hands_list = pre_processed
+
+            if not self._conn.poll():
+                return True
+
+    def find_hands(self, img, draw=False):
+        """Finds hands in an image.
+
+        Arguments:
+            img: RGB image to detect hands in.
+            draw: Draw the output on the image.
+
+        Return:
+            Image.
+        """
+        if self._fallback is None:
+            try:
+                return self._find_hands_worker(img, draw)
+            except (EOFError, OSError):
+                self._take_over()
+
+        self._fallback.reset_hands_list()
+        img = self._fallback.find_hands(img, draw)
+
+        self._hands_list, self._pre_processed_hands_list = self._fallback.get_hands()
+        self._landmarks = self._fallback.get_landmarks().copy()
+
+        return img
+
+    def _take_over(self):
+        """Replaces the dead worker with a detector in this process."""
+        self._process.join(timeout=1.0)
+        logger.error(
+            "Hand detector process exited (code %s); detecting in this process",
+            self._process.exitcode,
+        )
+
+        self._pending = 0
+        self._pending_config = None
+        self._fallback = HandDetector(**self._detector_kwargs)
+
+        if self._config:
+            self._fallback.configure(**self._config)
+
+    def _find_hands_worker(self, img, draw):
+        self._ring(img.shape)
+
+        # Collect whatever finished in the meantime.
+        self._receive(0)
+
+        if self._pending >= self._slots:
+            # The worker is behind; skip this frame rather than wait.
+            return img
+
+        if self._pending_config is not None:
+            config, self._pending_config = self._pending_config, None
+            self._conn.send(("config", config))
+
+        self._seq += 1
+        slot = self._seq % self._slots
+
+        np.copyto(self._frames[slot], img)
+        self._conn.send(("frame", slot, self._seq, draw))
+        self._pending += 1
+
+        while self._results_seq < self._seq:
+            if not self._receive(self._max_latency):
+                # Too slow; keep using the most recent hands.
+                return img
+
+        if draw:
+            np.copyto(img, self._frames[slot])
+
+        return img
+
+    def configure(self, **kwargs):
+        """Changes the worker's detection settings, from any thread; see
+        HandDetector.configure."""
+        self._config.update(kwargs)
+
+        if self._fallback is not None:
+            self._fallback.configure(**self._config)
+        else:
+            self._pending_config = kwargs
+
+    def get_hands(self):
+        """Gets a copy of the detected hands that stays valid after the next
+        detection.
+
+        Return:
+            [handedness, landmarks] of each hand and their pre-processed
+            landmarks.
+        """
+        return list(self._hands_list), self._pre_processed_hands_list
+
+    def get_num_hands(self):
+        return len(self._hands_list)
+
+    def get_landmarks(self):
+        return self._landmarks
+
+    def get_pre_processed_landmarks(self):
+        return self._pre_processed_hands_list
+
+    def reset_hands_list(self):
+        # Hands are replaced as a whole when a reply arrives.
+        pass
+
+    def close(self):
+        if self._fallback is not None:
+            self._fallback.close()
+
+        if self._process.is_alive():
+            self._conn.send(None)
+            self._process.join(timeout=1.0)
+
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            self._frames = None
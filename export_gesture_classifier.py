@@ -0,0 +1,124 @@
+"""Exports the gesture classifier's weights from the .tflite model to a .npz
+file that GestureMLP evaluates without any TFLite interpreter.
+
+Usage:
+    python export_gesture_classifier.py [model_path] [weights_path]
+"""
+import os
+import sys
+import numpy as np
+from gesture_classfier import GestureMLP, load_interpreter
+
+
+def _activation(x, weights, bias, y):
+    """Finds the activation fused into a fully connected op by comparing its
+    recorded output with the candidates applied to its pre-activation."""
+    pre = x @ weights.T + bias
+
+    for name, fn in (
+        ('linear', lambda v: v),
+        ('relu', lambda v: np.maximum(v, 0)),
+        ('relu6', lambda v: np.clip(v, 0, 6)),
+    ):
+        if np.allclose(fn(pre), y, rtol=1e-4, atol=1e-4):
+            return name
+
+    raise ValueError('Unsupported fused activation in a fully connected op.')
+
+
+def export(model_path, weights_path, backend=None):
+    """Exports the weights of a .tflite model made of fully connected layers
+    and an optional final softmax.
+
+    Arguments:
+        model_path: Path of the .tflite model.
+        weights_path: Path of the .npz file to write.
+        backend: TFLite interpreter backend used to read the model.
+    """
+    _, Interpreter = load_interpreter(backend)
+
+    # Keep intermediate tensors so fused activations can be identified.
+    interpreter = Interpreter(
+        model_path=model_path, experimental_preserve_all_tensors=True
+    )
+
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+
+    probe = np.random.default_rng(0).uniform(
+        -1, 1, (64, input_details['shape'][-1])
+    ).astype(np.float32)
+
+    interpreter.resize_tensor_input(input_details['index'], probe.shape)
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(input_details['index'], probe)
+    interpreter.invoke()
+
+    arrays = {}
+    activations = []
+    softmax = False
+    tensor = input_details['index']
+
+    for op in interpreter._get_ops_details():
+        if op['op_name'] == 'DELEGATE':
+            continue
+
+        if softmax or op['inputs'][0] != tensor:
+            raise ValueError('Only a chain of dense layers can be exported.')
+
+        if op['op_name'] == 'FULLY_CONNECTED':
+            x = interpreter.get_tensor(op['inputs'][0])
+            weights = interpreter.get_tensor(op['inputs'][1])
+            bias = (
+                interpreter.get_tensor(op['inputs'][2])
+                if len(op['inputs']) > 2 and op['inputs'][2] >= 0
+                else np.zeros(weights.shape[0], dtype=np.float32)
+            )
+            y = interpreter.get_tensor(op['outputs'][0])
+
+            # Stored as (in, out) so evaluation is a plain x @ weights.
+            i = len(activations)
+            arrays[f'weights_{i}'] = np.ascontiguousarray(weights.T)
+            arrays[f'bias_{i}'] = bias
+            activations.append(_activation(x, weights, bias, y))
+        elif op['op_name'] == 'SOFTMAX':
+            softmax = True
+        else:
+            raise ValueError(f"Unsupported op: {op['op_name']}")
+
+        tensor = op['outputs'][0]
+
+    if tensor != output_details['index']:
+        raise ValueError("The model's output isn't produced by its last op.")
+
+    np.savez(
+        weights_path,
+        activations=np.array(activations),
+        softmax=np.array(softmax),
+        **arrays,
+    )
+
+    # The exported evaluator must pick the same class as the interpreter.
+    expected = interpreter.get_tensor(output_details['index'])
+    result = GestureMLP(weights_path)(probe)
+
+    if not np.array_equal(np.argmax(result, axis=1), np.argmax(expected, axis=1)):
+        os.remove(weights_path)
+        raise ValueError('Exported weights disagree with the model.')
+
+    return np.abs(result - expected).max()
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'model/gesture_classifier.tflite'
+    weights_path = (
+        sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(model_path)[0] + '.npz'
+    )
+
+    error = export(model_path, weights_path)
+
+    print(f'Exported {weights_path} (max abs error {error:.2e})')
+
+
+if __name__ == '__main__':
+    main()
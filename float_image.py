@@ -1,62 +1,248 @@
 import os
 import cv2 as cv
+from PIL import Image
+from asset_cache import asset_cache, file_key
+
+# Smallest width of a level in the source image's mip pyramid.
+PYRAMID_MIN_WIDTH = 32
+
+# EXIF tag of the image's orientation.
+EXIF_ORIENTATION = 0x0112
+
+# Flags decoding a JPEG at a fraction of its size, by scale.
+JPEG_REDUCED_FLAGS = (
+    (8, cv.IMREAD_REDUCED_COLOR_8),
+    (4, cv.IMREAD_REDUCED_COLOR_4),
+    (2, cv.IMREAD_REDUCED_COLOR_2),
+)
 
 
 class FloatImage:
-    def __init__(self, path, cap_w=None):
+    def __init__(
+        self,
+        path,
+        cap_w=None,
+        interpolation=cv.INTER_AREA,
+        cache=asset_cache,
+        max_width=None,
+    ):
         """Initializes an interactable image using hand gestures.
 
         Arguments:
             path: File path of the image.
             pos: Position of the image.
+            interpolation: Interpolation used when the image is resized.
+            cache: Cache the decoded image and its resized variants are
+            shared through.
+            max_width: Largest width the image is ever shown at, or None for
+            no limit. Larger images are decoded at a reduced scale when their
+            format allows it and only kept at this width.
         """
 
         self._path = path
+        self._interpolation = interpolation
+        self._cache = cache
+        self._max_width = max_width
+
+        # Keep the decoded image so resizing never goes back to the disk,
+        # not even to stat the file; images of the same file share it.
+        self._file = file_key(path)
+        self._src, self._pyramid = self._cache.get(
+            self._file, ("source", self._max_width), self._load
+        )
+        self._png = self._src.shape[2] == 4
 
+        self._set_width(int(cap_w * 0.12))
+        self._pos = (cap_w - self._size[1], 0)
+        self._dragging = None
+        self._resizing = None
+
+    def _load(self):
+        """Decodes the image and builds its pyramid.
+
+        Return:
+            Decoded RGB(A) image and its pyramid.
+        """
         # Load the image with alpha channel if the image format
         # is png, otherwise load the image by default.
         if "png" in os.path.splitext(self._path)[1]:
-            self._img = cv.imread(self._path, cv.IMREAD_UNCHANGED)
-            self._png = True if self._img.shape[2] == 4 else False
+            src = cv.imread(self._path, cv.IMREAD_UNCHANGED)
         else:
-            self._img = cv.imread(self._path)
-            self._png = False
+            src = cv.imread(self._path, self._reduced_flag())
+
+        src = self._to_rgb(src)
+
+        # Only keep the largest size the image is shown at.
+        if self._max_width is not None and src.shape[1] > self._max_width:
+            h, w = src.shape[:2]
+            src = cv.resize(
+                src,
+                (self._max_width, max(round(h * self._max_width / w), 1)),
+                interpolation=cv.INTER_AREA,
+            )
+
+        return src, self._build_pyramid(src)
+
+    def _reduced_flag(self):
+        """Picks the most reduced scale a JPEG can be decoded at while still
+        being at least the maximum width.
+
+        Return:
+            cv.imread flag.
+        """
+        if self._max_width is None or os.path.splitext(self._path)[1].lower() not in (
+            ".jpg",
+            ".jpeg",
+        ):
+            return cv.IMREAD_COLOR
+
+        # Only the header is read. EXIF orientations 5 to 8 rotate the
+        # image by a quarter turn when it's decoded.
+        with Image.open(self._path) as img:
+            width, height = img.size
+            rotated = img.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+
+        if rotated:
+            width = height
+
+        for scale, flag in JPEG_REDUCED_FLAGS:
+            if width // scale >= self._max_width:
+                return flag
 
-        self._img = self.img_resize(width=int(cap_w * 0.12))
+        return cv.IMREAD_COLOR
+
+    def _to_rgb(self, img):
+        """Converts a decoded image to the pipeline's RGB(A) colour space."""
+        if img.shape[2] == 4:
+            return cv.cvtColor(img, cv.COLOR_BGRA2RGBA)
+
+        return cv.cvtColor(img, cv.COLOR_BGR2RGB)
+
+    def _build_pyramid(self, img):
+        """Builds a mip pyramid of an image, halving each level.
+
+        Arguments:
+            img: Full size image.
+
+        Return:
+            List of levels, from the full size image down to the smallest.
+        """
+        pyramid = [img]
+
+        while pyramid[-1].shape[1] // 2 >= PYRAMID_MIN_WIDTH:
+            h, w = pyramid[-1].shape[:2]
+            pyramid.append(
+                cv.resize(
+                    pyramid[-1], (w // 2, max(h // 2, 1)), interpolation=cv.INTER_AREA
+                )
+            )
+
+        return pyramid
+
+    def _set_width(self, width):
+        """Makes a resized variant of the source image the displayed one.
+
+        Resized variants are cached so that going back and forth during a
+        resize gesture doesn't resample the image again, and images of the
+        same file and size share their pixels.
+
+        Arguments:
+            width: Width of the displayed image.
+        """
+        # Variants are only shared between images decoded the same way.
+        self._img, self._alpha_inv = self._cache.get(
+            self._file,
+            ("resized", width, self._interpolation, self._max_width),
+            lambda: self._premultiply(
+                self.img_resize(width=width, interpolation=self._interpolation)
+            ),
+        )
         self._size = self._img.shape[:2]
-        self._pos = (cap_w - self._size[1], 0)
-        self._dragging = None
-        self._resizing = None
 
-    def img_resize(self, width=None, height=None, interpolation=cv.INTER_AREA):
-        """Initializes an interactable image using hand gestures.
+    def set_interpolation(self, interpolation):
+        """Changes the interpolation used for resizing from the next resize
+        on; the displayed size keeps its current image.
+
+        Arguments:
+            interpolation: Interpolation used when the image is resized.
+        """
+        self._interpolation = interpolation
+
+    def get_interpolation(self):
+        return self._interpolation
+
+    def _premultiply(self, img):
+        """Converts the image to the form the compositor blends.
+
+        PNGs are kept as premultiplied RGB plus an inverted alpha plane
+        (255 - alpha) expanded to three channels, other images as plain RGB.
+
+        Arguments:
+            img: RGB(A) image with straight alpha.
+
+        Return:
+            Image and its inverted alpha, None for images without alpha.
+        """
+        if not self._png:
+            return img, None
+
+        alpha = cv.cvtColor(cv.extractChannel(img, 3), cv.COLOR_GRAY2RGB)
+
+        return (
+            cv.multiply(cv.cvtColor(img, cv.COLOR_RGBA2RGB), alpha, scale=1 / 255),
+            cv.bitwise_not(alpha),
+        )
+
+    def img_dim(self, width=None, height=None):
+        """Gets the dimension of the source image resized to a width or height.
 
         Arguments:
-            img: Image.
             width: Preferred width.
             height: Preferred height.
 
         Return:
-            Resized image, if no width and height given then it returns
-            the given image.
+            Dimension (width, height) that maintains the aspect ratio.
         """
         # Gets the size of the image.
-        h, w = self._img.shape[:2]
+        h, w = self._src.shape[:2]
 
         if width is None and height is None:
-            return self._img
-
-        dim = None
+            return w, h
 
         # Finds the ratio and use it to get the desired dimension.
         if width is None:
             r = height / float(h)
-            dim = (int(w * r), height)
-        else:
-            r = width / float(w)
-            dim = (width, int(h * r))
+            return int(w * r), height
+
+        r = width / float(w)
+        return width, int(h * r)
+
+    def img_resize(self, width=None, height=None, interpolation=cv.INTER_AREA):
+        """Resizes the source image.
 
-        return cv.resize(self._img, dim, interpolation=interpolation)
+        Arguments:
+            width: Preferred width.
+            height: Preferred height.
+            interpolation: Interpolation used for resizing.
+
+        Return:
+            Resized image, if no width and height given then it returns
+            the source image.
+        """
+        if width is None and height is None:
+            return self._src
+
+        dim = self.img_dim(width, height)
+
+        # Resize from the smallest pyramid level that is still at least as
+        # large as the target, which keeps downscales cheap and sharp.
+        level = self._pyramid[0]
+        for img in self._pyramid[1:]:
+            if img.shape[1] < dim[0] or img.shape[0] < dim[1]:
+                break
+            level = img
+
+        return cv.resize(level, dim, interpolation=interpolation)
 
     def drag_start(self, handedness, cursor):
         cursor_x, cursor_y = cursor
@@ -137,11 +323,7 @@ class FloatImage:
 
         padding = int(resize_w * 0.20)
 
-        img = self.img_resize(
-            width=resize_w - padding,
-        )
-
-        h, w = img.shape[:2]
+        w, h = self.img_dim(width=resize_w - padding)
 
         if w < self.get_width() and w < frame_w * 0.05:
             return
@@ -158,13 +340,7 @@ class FloatImage:
         if y + h > frame_h:
             return
 
-        if self._png:
-            self._img = cv.imread(self._path, cv.IMREAD_UNCHANGED)
-        else:
-            self._img = cv.imread(self._path)
-
-        self._img = self.img_resize(width=resize_w - padding)
-        self._size = self._img.shape[:2]
+        self._set_width(resize_w - padding)
 
         self.set_pos_x(
             int(abs((cursor[0] + other_cursor[0]) / 2) - (self.get_width() / 2))
@@ -179,6 +355,9 @@ class FloatImage:
     def get_img(self):
         return self._img
 
+    def get_alpha_inv(self):
+        return self._alpha_inv
+
     def get_width(self):
         return self._size[1]
 
@@ -191,6 +370,14 @@ class FloatImage:
     def get_pos_y(self):
         return self._pos[1]
 
+    def set_img_width(self, width):
+        """Resizes the displayed image to a width, keeping its aspect ratio.
+
+        Arguments:
+            width: Width of the displayed image.
+        """
+        self._set_width(width)
+
     def set_width(self, w):
         self._size = (self._size[0], w)
 
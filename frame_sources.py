@@ -0,0 +1,302 @@
+import glob
+import os
+import cv2 as cv
+import numpy as np
+
+# Extensions of the images an image sequence directory is read from.
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Landmarks of an open right hand, normalized to the hand's box, in the
+# order MediaPipe numbers them: the wrist, then each finger from its base.
+OPEN_HAND = np.array(
+    [
+        (0.50, 1.00),
+        (0.35, 0.90), (0.25, 0.78), (0.18, 0.68), (0.12, 0.58),
+        (0.38, 0.55), (0.36, 0.38), (0.35, 0.27), (0.34, 0.17),
+        (0.50, 0.53), (0.50, 0.33), (0.50, 0.21), (0.50, 0.10),
+        (0.61, 0.55), (0.63, 0.37), (0.64, 0.26), (0.65, 0.17),
+        (0.71, 0.60), (0.75, 0.47), (0.77, 0.39), (0.79, 0.31),
+    ],
+    dtype=np.float32,
+)
+
+# Fingers extended in each pose: thumb, index, middle, ring and pinky.
+HAND_POSES = {
+    "open": (True, True, True, True, True),
+    "pointer": (False, True, False, False, False),
+    "drag": (False, True, True, False, False),
+    "fist": (False, False, False, False, False),
+}
+
+# Offsets of the joints of a folded finger and thumb from their base joint.
+FOLDED_FINGER = np.array(
+    [(0.0, -0.08), (0.0, 0.0), (0.0, 0.07)], dtype=np.float32
+)
+FOLDED_THUMB = np.array(
+    [(0.08, -0.06), (0.16, -0.08), (0.22, -0.05)], dtype=np.float32
+)
+
+# Number of pixels at the start of a synthetic frame's first row holding the
+# frame's number, one bit per pixel.
+FRAME_INDEX_BITS = 32
+
+# Joints joined by the bones of a rendered hand.
+HAND_BONES = (
+    [(0, 1), (1, 2), (2, 3), (3, 4)]
+    + [(0, 5), (5, 6), (6, 7), (7, 8)]
+    + [(5, 9), (9, 10), (10, 11), (11, 12)]
+    + [(9, 13), (13, 14), (14, 15), (15, 16)]
+    + [(13, 17), (0, 17), (17, 18), (18, 19), (19, 20)]
+)
+
+
+def hand_pose(pose):
+    """Gets the normalized landmarks of a hand pose.
+
+    Arguments:
+        pose: Name of the pose, see HAND_POSES.
+
+    Return:
+        Landmarks (21, 2) normalized to the hand's box.
+    """
+    landmarks = OPEN_HAND.copy()
+
+    for finger, extended in enumerate(HAND_POSES[pose]):
+        if extended:
+            continue
+
+        base = 1 + finger * 4
+
+        # A folded finger curls in front of the palm; the thumb across it.
+        landmarks[base + 1 : base + 4] = landmarks[base] + (
+            FOLDED_THUMB if finger == 0 else FOLDED_FINGER
+        )
+
+    return landmarks
+
+
+def read_frame_index(frame, mirrored=False):
+    """Reads the number a synthetic source wrote into one of its frames.
+
+    Arguments:
+        frame: Frame generated by a SyntheticSource, BGR or RGB.
+        mirrored: Whether the frame was mirrored since it was generated.
+
+    Return:
+        Number of the frame, from 0.
+    """
+    row = frame[0, ::-1] if mirrored else frame[0]
+    bits = row[:FRAME_INDEX_BITS, 0] > 127
+
+    return int(np.dot(bits, 1 << np.arange(FRAME_INDEX_BITS, dtype=np.int64)))
+
+
+class ImageSequenceSource:
+    def __init__(self, paths, fps=30):
+        """Initializes a source reading frames from image files, in order.
+
+        It reads like cv.VideoCapture, so Capture uses it in its place.
+
+        Arguments:
+            paths: Paths of the images, or a directory or glob pattern.
+            fps: Frame rate the images are played back at.
+        """
+        if isinstance(paths, str):
+            if os.path.isdir(paths):
+                paths = [
+                    os.path.join(paths, name)
+                    for name in os.listdir(paths)
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                ]
+            else:
+                paths = glob.glob(paths)
+
+            paths = sorted(paths)
+
+        self._paths = list(paths)
+        self._fps = fps
+        self._index = 0
+        self._opened = len(self._paths) > 0
+
+        # The first image gives the sequence's size.
+        first = cv.imread(self._paths[0]) if self._opened else None
+        self._size = first.shape[:2] if first is not None else (0, 0)
+
+    def read(self):
+        if not self._opened or self._index >= len(self._paths):
+            return False, None
+
+        frame = cv.imread(self._paths[self._index])
+        self._index += 1
+
+        return frame is not None, frame
+
+    def get(self, prop):
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return self._size[1]
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return self._size[0]
+        if prop == cv.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return len(self._paths)
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            return self._index
+
+        return 0
+
+    def set(self, prop, value):
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            self._index = int(value)
+            return True
+        if prop == cv.CAP_PROP_FPS:
+            self._fps = value
+            return True
+
+        return False
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+
+class SyntheticSource:
+    def __init__(
+        self,
+        width=640,
+        height=480,
+        fps=30,
+        frames=None,
+        poses=("open", "pointer", "drag", "fist"),
+        pose_frames=30,
+        hand_size=0.4,
+    ):
+        """Initializes a source generating frames of a rendered hand moving
+        across a plain background, cycling through known poses.
+
+        The hand's landmarks in each frame are known, so it can serve as
+        ground truth; each frame carries its number in its first pixels, see
+        read_frame_index(). It reads like cv.VideoCapture, so Capture uses it
+        in its place. The hand is flat shaded, so the hand detector doesn't
+        necessarily find it; the detector still does its full work on each
+        frame, which is what throughput measurements need.
+
+        Arguments:
+            width: Frame width.
+            height: Frame height.
+            fps: Frame rate the frames are played back at.
+            frames: Number of frames, or None for no end.
+            poses: Names of the poses the hand cycles through.
+            pose_frames: Number of frames each pose is held for.
+            hand_size: Height of the hand relative to the frame's height.
+        """
+        self._width = width
+        self._height = height
+        self._fps = fps
+        self._frames = frames
+        self._poses = poses
+        self._pose_frames = pose_frames
+        self._hand_size = hand_size
+        self._index = 0
+        self._opened = True
+
+        # The background is drawn once; each frame starts from a copy.
+        self._background = np.empty((height, width, 3), dtype=np.uint8)
+        self._background[:] = np.linspace(40, 90, height, dtype=np.uint8)[
+            :, None, None
+        ]
+
+        self._pose_landmarks = {pose: hand_pose(pose) for pose in set(poses)}
+
+    def get_pose(self, index):
+        """Gets the hand rendered in a frame.
+
+        Arguments:
+            index: Number of the frame, from 0.
+
+        Return:
+            Name of the pose and its landmarks (21, 2) in pixels of the
+            frame as generated, before any mirroring.
+        """
+        pose = self._poses[(index // self._pose_frames) % len(self._poses)]
+
+        # The hand follows a slow Lissajous path that stays in the frame.
+        side = self._hand_size * self._height
+        t = index / self._fps
+        cx = self._width / 2 + (self._width - side) / 2 * 0.8 * np.sin(0.5 * t)
+        cy = self._height / 2 + (self._height - side) / 2 * 0.8 * np.sin(0.8 * t)
+
+        landmarks = (self._pose_landmarks[pose] - 0.5) * side + (cx, cy)
+
+        return pose, landmarks
+
+    def _render(self, index):
+        frame = self._background.copy()
+        _, landmarks = self.get_pose(index)
+        points = np.round(landmarks).astype(np.int32)
+        thickness = max(int(self._hand_size * self._height / 16), 2)
+
+        # Skin tone, in BGR like a camera frame.
+        color = (120, 160, 215)
+
+        cv.fillPoly(frame, [points[[0, 1, 5, 9, 13, 17]]], color, cv.LINE_AA)
+
+        for start, end in HAND_BONES:
+            cv.line(
+                frame,
+                tuple(points[start]),
+                tuple(points[end]),
+                color,
+                thickness,
+                cv.LINE_AA,
+            )
+
+        # The frame's number, so its ground truth can be found again after
+        # the frame went through the pipeline.
+        bits = (index >> np.arange(FRAME_INDEX_BITS)) & 1
+        frame[0, :FRAME_INDEX_BITS] = (bits * 255)[:, None]
+
+        return frame
+
+    def read(self):
+        if not self._opened or (
+            self._frames is not None and self._index >= self._frames
+        ):
+            return False, None
+
+        frame = self._render(self._index)
+        self._index += 1
+
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv.CAP_PROP_FRAME_WIDTH:
+            return self._width
+        if prop == cv.CAP_PROP_FRAME_HEIGHT:
+            return self._height
+        if prop == cv.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return self._frames if self._frames is not None else -1
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            return self._index
+
+        return 0
+
+    def set(self, prop, value):
+        if prop == cv.CAP_PROP_POS_FRAMES:
+            self._index = int(value)
+            return True
+        if prop == cv.CAP_PROP_FPS:
+            self._fps = value
+            return True
+
+        return False
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
@@ -0,0 +1,241 @@
+import json
+import threading
+import time
+import cv2 as cv
+import numpy as np
+
+# Stages of the frame pipeline, in the order they run.
+STAGES = (
+    "capture",
+    "prepare",
+    "detect",
+    "classify",
+    "composite",
+    "send",
+    "preview",
+    "display",
+)
+
+
+class _Timer:
+    __slots__ = ("_stats", "_stage", "_start")
+
+    def __init__(self, stats, stage):
+        self._stats = stats
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._stats.add(self._stage, time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class FrameStats:
+    def __init__(self, window=300, export_path=None, export_interval=1.0):
+        """Initializes per-stage latency statistics of the frame pipeline.
+
+        Arguments:
+            window: Number of most recent samples each stage's percentiles
+            are computed from.
+            export_path: File the statistics are appended to as JSON lines,
+            or None to not export them.
+            export_interval: Seconds between two exported lines.
+        """
+        self._window = window
+        self._export_path = export_path
+        self._export_interval = export_interval
+        self._enabled = export_path is not None
+
+        # Ring buffer of the latest durations, in milliseconds, per stage.
+        # Every pipeline thread adds to them, so they're guarded by a lock.
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._export_time = time.perf_counter()
+        self._export_frames = 0
+
+        # Callables returning extra statistics, by name, reported along
+        # with the stages.
+        self._info = {}
+
+    def time(self, stage):
+        """Times a stage of the pipeline, used as a context manager.
+
+        Arguments:
+            stage: Name of the stage.
+
+        Return:
+            Timer, which does nothing while the statistics are disabled.
+        """
+        if not self._enabled:
+            return _NULL_TIMER
+
+        return _Timer(self, stage)
+
+    def add(self, stage, seconds):
+        """Records how long a stage took.
+
+        Arguments:
+            stage: Name of the stage.
+            seconds: Duration of the stage.
+        """
+        with self._lock:
+            samples = self._samples.get(stage)
+
+            if samples is None:
+                samples = self._samples[stage] = np.zeros(
+                    self._window, dtype=np.float32
+                )
+                self._counts[stage] = 0
+
+            samples[self._counts[stage] % self._window] = seconds * 1000
+            self._counts[stage] += 1
+
+    def end_frame(self):
+        """Marks the end of a frame and exports the statistics when due."""
+        if not self._enabled:
+            return
+
+        self._frames += 1
+
+        if self._export_path is None:
+            return
+
+        now = time.perf_counter()
+        elapsed = now - self._export_time
+
+        if elapsed < self._export_interval:
+            return
+
+        line = {
+            "time": time.time(),
+            "fps": (self._frames - self._export_frames) / elapsed,
+            "stages": self.percentiles(),
+        }
+
+        for name, provider in self._info.items():
+            line[name] = provider()
+
+        with open(self._export_path, "a") as f:
+            f.write(json.dumps(line) + "\n")
+
+        self._export_time = now
+        self._export_frames = self._frames
+
+    def percentiles(self):
+        """Gets the rolling latency percentiles of each stage.
+
+        Return:
+            Dictionary of stage names to their p50, p95 and p99 in
+            milliseconds and their number of samples.
+        """
+        # Copy the samples so the percentiles are computed without holding
+        # up the threads adding to them.
+        with self._lock:
+            snapshot = [
+                (stage, self._samples[stage][: min(count, self._window)].copy(), count)
+                for stage, count in self._counts.items()
+            ]
+
+        stats = {}
+
+        for stage, samples, count in sorted(
+            snapshot,
+            key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES),
+        ):
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            stats[stage] = {
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "count": count,
+            }
+
+        return stats
+
+    def draw(self, img):
+        """Draws the statistics on an image, in place.
+
+        Arguments:
+            img: Image to draw on.
+
+        Return:
+            Image.
+        """
+        y = 16
+
+        for stage, stats in self.percentiles().items():
+            text = (
+                f"{stage:<10}"
+                f"{stats['p50']:6.1f}{stats['p95']:6.1f}{stats['p99']:6.1f} ms"
+            )
+            self._draw_line(img, text, y)
+
+            y += 16
+
+        # Extra statistics on one line each, only their plain values.
+        for name, provider in self._info.items():
+            values = " ".join(
+                f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in provider().items()
+                if isinstance(value, (int, float, str))
+            )
+            self._draw_line(img, f"{name:<10}{values}", y)
+
+            y += 16
+
+        return img
+
+    def _draw_line(self, img, text, y):
+        # Outline the text so it stays readable on any background.
+        for color, thickness in (((0, 0, 0), 3), ((255, 255, 255), 1)):
+            cv.putText(
+                img,
+                text,
+                (8, y),
+                cv.FONT_HERSHEY_PLAIN,
+                1,
+                color,
+                thickness,
+                cv.LINE_AA,
+            )
+
+    def set_info(self, name, provider):
+        """Reports extra statistics along with the stages.
+
+        Arguments:
+            name: Name the statistics are reported under.
+            provider: Callable returning a dictionary of the statistics.
+        """
+        self._info[name] = provider
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+
+    def is_enabled(self):
+        return self._enabled
+
+    def is_exporting(self):
+        return self._export_path is not None
+
+    def set_enabled(self, flag):
+        self._enabled = flag or self.is_exporting()
@@ -1,5 +1,93 @@
+import os
 import numpy as np
-import tensorflow as tf
+
+# TFLite interpreter backends, from the lightest to the heaviest.
+TFLITE_BACKENDS = ('tflite_runtime', 'ai_edge_litert', 'tensorflow')
+
+# All backends; the NumPy one needs weights exported with
+# export_gesture_classifier.py.
+BACKENDS = ('numpy',) + TFLITE_BACKENDS
+
+
+def load_interpreter(backend=None):
+    """Imports a TFLite interpreter class without pulling in more than needed.
+
+    Arguments:
+        backend: Name of the backend to use, or None to use the lightest one
+        that is installed.
+
+    Return:
+        Name of the backend and its interpreter class.
+    """
+    for name in TFLITE_BACKENDS if backend is None else (backend,):
+        try:
+            if name == 'tflite_runtime':
+                from tflite_runtime.interpreter import Interpreter
+            elif name == 'ai_edge_litert':
+                from ai_edge_litert.interpreter import Interpreter
+            elif name == 'tensorflow':
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+            else:
+                raise ValueError(f'Unknown backend: {name}')
+        except ImportError:
+            if backend is not None:
+                raise
+            continue
+
+        return name, Interpreter
+
+    raise ImportError(
+        'No TFLite interpreter found; install tflite-runtime, ai-edge-litert '
+        'or tensorflow.')
+
+
+class GestureMLP(object):
+    def __init__(
+        self,
+        weights_path='model/gesture_classifier.npz',
+    ):
+        """Evaluates the gesture classifier's dense layers with NumPy.
+
+        Arguments:
+            weights_path: Weights exported by export_gesture_classifier.py.
+        """
+        with np.load(weights_path) as weights:
+            self.activations = [str(a) for a in weights['activations']]
+            self.weights = [
+                weights[f'weights_{i}'] for i in range(len(self.activations))
+            ]
+            self.biases = [
+                weights[f'bias_{i}'] for i in range(len(self.activations))
+            ]
+            self.softmax = bool(weights['softmax'])
+
+        self.num_classes = self.biases[-1].shape[0]
+
+    def __call__(
+        self,
+        x,
+    ):
+        """Evaluates a batch of inputs, (N, 42), in one matrix multiply per
+        layer and returns the class probabilities, (N, classes)."""
+        x = np.asarray(x, dtype=np.float32)
+
+        for weights, bias, activation in zip(
+                self.weights, self.biases, self.activations):
+            x = x @ weights
+            x += bias
+
+            if activation == 'relu':
+                np.maximum(x, 0, out=x)
+            elif activation == 'relu6':
+                np.clip(x, 0, 6, out=x)
+
+        if self.softmax:
+            x -= x.max(axis=1, keepdims=True)
+            np.exp(x, out=x)
+            x /= x.sum(axis=1, keepdims=True)
+
+        return x
 
 
 class GestureClassifier(object):
@@ -7,28 +95,79 @@ class GestureClassifier(object):
         self,
         model_path='model/gesture_classifier.tflite',
         num_threads=4,
+        backend=None,
     ):
-        self.interpreter = tf.lite.Interpreter(model_path=model_path,
-                                               num_threads=num_threads)
+        weights_path = os.path.splitext(model_path)[0] + '.npz'
+
+        # Prefer the exported weights; they need neither an interpreter
+        # nor its per-invoke overhead.
+        if backend == 'numpy' or (
+                backend is None and os.path.exists(weights_path)):
+            self.backend = 'numpy'
+            self.interpreter = GestureMLP(weights_path)
+            self._num_classes = self.interpreter.num_classes
+            return
+
+        self.backend, Interpreter = load_interpreter(backend)
+
+        self.interpreter = Interpreter(model_path=model_path,
+                                       num_threads=num_threads)
 
         self.interpreter.allocate_tensors()
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
 
+        self._batch_size = self.input_details[0]['shape'][0]
+        self._num_classes = self.output_details[0]['shape'][-1]
+
     def __call__(
         self,
         landmark_list,
     ):
+        result_index, _ = self.classify([landmark_list])
+
+        return result_index[0]
+
+    def classify(
+        self,
+        landmark_lists,
+    ):
+        """Classifies the gestures of several hands with a single invoke.
+
+        Arguments:
+            landmark_lists: Pre-processed landmarks of each hand, (N, 42).
+
+        Return:
+            Class index of each hand, (N,), and the class probabilities of
+            each hand, (N, classes).
+        """
+        landmarks = np.asarray(landmark_lists, dtype=np.float32)
+
+        if len(landmarks) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(
+                (0, self._num_classes), dtype=np.float32)
+
+        if self.backend == 'numpy':
+            result = self.interpreter(landmarks)
+
+            return np.argmax(result, axis=1), result
+
         input_details_tensor_index = self.input_details[0]['index']
-        self.interpreter.set_tensor(
-            input_details_tensor_index,
-            np.array([landmark_list], dtype=np.float32))
+
+        # Resize the input tensor only when the number of hands changes.
+        if len(landmarks) != self._batch_size:
+            self.interpreter.resize_tensor_input(
+                input_details_tensor_index, landmarks.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(landmarks)
+
+        self.interpreter.set_tensor(input_details_tensor_index, landmarks)
         self.interpreter.invoke()
 
         output_details_tensor_index = self.output_details[0]['index']
 
         result = self.interpreter.get_tensor(output_details_tensor_index)
 
-        result_index = np.argmax(np.squeeze(result))
+        result_index = np.argmax(result, axis=1)
 
-        return result_index
+        return result_index, result
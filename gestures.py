@@ -0,0 +1,104 @@
+from constants import *
+
+
+class GestureHandler:
+    def __init__(self, hand_detector):
+        """Initializes the handler that applies the hands' gestures to the
+        float images.
+
+        Arguments:
+            hand_detector: Hand detector, used for its geometry helpers.
+        """
+        self._hand_detector = hand_detector
+
+    def apply(self, frame, scene, hands_list, gestures):
+        """Drags, resizes and deletes float images following the gestures.
+
+        Arguments:
+            frame: Frame the float images are drawn on.
+            scene: Scene of the float images, deleted ones are removed from it.
+            hands_list: [handedness, landmarks] of each hand.
+            gestures: Gesture of each hand.
+        """
+        # Every hand's cursors, the midpoint of the index and middle finger
+        # tips and the index finger tip, are looked up in one query.
+        cursors = [
+            self._hand_detector.get_midpoint(
+                hand[1][MIDDLE_FINGER_TIP], hand[1][INDEX_FINGER_TIP]
+            )
+            for hand in hands_list
+        ]
+        hits = scene.topmost_at(
+            cursors + [hand[1][INDEX_FINGER_TIP] for hand in hands_list]
+        )
+        tip_hits = hits[len(hands_list) :]
+
+        # drag doesnt work if two hands
+        for i, hand in enumerate(hands_list):
+            gesture = gestures[i]
+
+            if gesture == GESTURE_DRAG:
+                # Make index finger the cursor.
+                cursor = cursors[i]
+
+                # Check if a float image is currenly being dragged.
+                dragging_float_image = scene.get_dragging(hand[0])
+
+                if dragging_float_image:
+
+                    if len(hands_list) > 1:
+                        if dragging_float_image._resizing:
+
+                            other_cursor = hands_list[(i + 1) % 2][1][INDEX_FINGER_TIP]
+
+                            dragging_float_image.resize(
+                                frame,
+                                cursor, 
+                                other_cursor,
+                                int(self._hand_detector.get_distance(cursor, other_cursor)),
+                            )
+                            scene.update(dragging_float_image)
+
+                            continue
+
+                    dragging_float_image.drag(frame, cursor)
+                    scene.update(dragging_float_image)
+
+                    if len(hands_list) > 1:
+
+                        other_hand_gesture = gestures[(i + 1) % 2]
+
+                        if other_hand_gesture == GESTURE_POINTER:
+                            other_cursor = hands_list[(i + 1) % 2][1][INDEX_FINGER_TIP]
+
+                            dragging_float_image.resize_start(cursor, other_cursor)
+
+                # Otherwise pick the topmost image under the cursor to be dragged
+                else:
+                    float_image = hits[i]
+
+                    if float_image in scene and float_image.drag_start(
+                        hand[0], cursor
+                    ):
+                        scene.set_dragging(hand[0], float_image)
+                        scene.raise_to_top(float_image)
+
+                continue
+
+            if len(hands_list) > 1:
+                if gesture == GESTURE_DELETE:
+                    other_hand_gesture = gestures[(i + 1) % 2]
+
+                    if other_hand_gesture == GESTURE_POINTER:
+                        # Delete the topmost image under the other hand's pointer.
+                        float_image = tip_hits[(i + 1) % 2]
+
+                        if float_image in scene:
+                            scene.remove(float_image)
+
+            float_image = scene.get_dragging(hand[0])
+
+            if float_image:
+                float_image._dragging = None
+                float_image._resizing = None
+                scene.set_dragging(hand[0], None)
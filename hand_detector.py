@@ -1,8 +1,16 @@
+import time
+from types import SimpleNamespace
 import mediapipe as mp
-from math import hypot
+from mediapipe.framework.formats import classification_pb2, landmark_pb2
 import cv2 as cv
-from itertools import chain
-from copy import deepcopy
+import numpy as np
+from math import ceil, hypot
+from frame_sources import read_frame_index
+
+# Hand speeds, as a fraction of the image diagonal per frame, below which
+# detection runs at the longest interval and above which it runs every frame.
+ADAPTIVE_SLOW_SPEED = 0.002
+ADAPTIVE_FAST_SPEED = 0.02
 
 
 class HandDetector:
@@ -10,8 +18,16 @@ class HandDetector:
         self,
         static_image_mode=False,
         max_num_hands=2,
+        model_complexity=1,
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5,
+        detection_width=None,
+        roi_tracking=False,
+        roi_margin=0.5,
+        roi_full_interval=15,
+        adaptive=False,
+        max_interval=4,
+        frame_budget=None,
     ):
         """Initializes hand detector.
 
@@ -19,107 +35,435 @@ class HandDetector:
             static_image_mode: Whether to treat the input images as a batch of static
             and possibly unrelated images, or a video stream.
             max_num_hands: Maximum number of hands to detect.
+            model_complexity: Complexity of the hand landmark model, 0 or 1;
+            0 is faster but less accurate.
             min_detection_confidence: Minimum confidence value ([0.0, 1.0]) for hand
             detection to be considered successful.
             min_tracking_confidence: Minimum confidence value ([0.0, 1.0]) for the
             hand landmarks to be considered tracked successfully.
+            detection_width: Width the image is downscaled to before detection,
+            or None to detect at full resolution.
+            roi_tracking: Only detect within a region around the hands found in
+            the previous frame.
+            roi_margin: Margin added around the hands' bounding box, relative to
+            the box's size.
+            roi_full_interval: Number of frames after which the whole image is
+            scanned again, so hands entering elsewhere are found.
+            adaptive: Only run the detector every few frames, depending on how
+            fast the hands move, and predict the landmarks in between.
+            max_interval: Maximum number of frames between two detections in
+            adaptive mode.
+            frame_budget: Seconds available per frame; in adaptive mode the
+            detector runs less often if it doesn't fit in this budget.
         """
         self._static_image_mode = static_image_mode
         self._max_num_hands = max_num_hands
+        self._model_complexity = model_complexity
         self._min_detection_confidence = min_detection_confidence
         self._min_tracking_confidence = min_tracking_confidence
+        self._detection_width = detection_width
+        self._roi_tracking = roi_tracking
+        self._roi_margin = roi_margin
+        self._roi_full_interval = roi_full_interval
+        self._adaptive = adaptive
+        self._max_interval = max_interval
+        self._frame_budget = frame_budget
 
         self._mp_hands = mp.solutions.hands
         self._mp_drawing = mp.solutions.drawing_utils
+        self._hands = None
+        self._create_hands()
+
+        # Settings changed by configure(), applied before the next detection.
+        self._pending_config = None
+
+        # Region (x0, y0, x1, y1) the hands are tracked in, None for the
+        # whole image, and the number of frames since the last full scan.
+        self._roi = None
+        self._roi_frames = 0
+
+        # Hands of the last detection, their velocity in pixels per frame
+        # and the cadence the detector runs at in adaptive mode.
+        self._track_landmarks = np.zeros((0, 21, 2), dtype=np.float32)
+        self._track_velocity = np.zeros((0, 21, 2), dtype=np.float32)
+        self._track_handedness = []
+        self._track_scores = np.zeros(0, dtype=np.float32)
+        self._frames_since_detect = 0
+        self._interval = 1
+        self._detect_time = None
+
+        # Landmarks are drawn on RGB frames, so give the default red in RGB order.
+        self._landmark_drawing_spec = self._mp_drawing.DrawingSpec(color=(255, 0, 0))
+
+    def _create_hands(self):
+        """(Re)creates the MediaPipe hands solution and the hand buffers."""
+        if self._hands is not None:
+            self._hands.close()
+
         self._hands = self._mp_hands.Hands(
-            self._static_image_mode,
-            self._max_num_hands,
-            self._min_detection_confidence,
-            self._min_tracking_confidence,
+            static_image_mode=self._static_image_mode,
+            max_num_hands=self._max_num_hands,
+            model_complexity=self._model_complexity,
+            min_detection_confidence=self._min_detection_confidence,
+            min_tracking_confidence=self._min_tracking_confidence,
+        )
+
+        self._create_buffers()
+
+    def _create_buffers(self):
+        # Detected hands, stored in buffers allocated for the maximum number
+        # of hands: landmarks in pixels, (hands, 21, 2), their normalized
+        # source coordinates, handedness labels and handedness scores.
+        self._num_hands = 0
+        self._landmarks = np.zeros((self._max_num_hands, 21, 2), dtype=np.int32)
+        self._landmarks_norm = np.zeros(
+            (self._max_num_hands, 21, 2), dtype=np.float32
         )
+        self._handedness = np.empty(self._max_num_hands, dtype=object)
+        self._scores = np.zeros(self._max_num_hands, dtype=np.float32)
+
+        # [handedness, landmarks] of each hand; views of the buffers above.
         self._hands_list = []
-        self._pre_processed_hands_list = []
+        self._pre_processed_hands_list = np.zeros((0, 42), dtype=np.float32)
+
+    def configure(
+        self, detection_width=None, model_complexity=None, max_num_hands=None
+    ):
+        """Changes the detection settings, from any thread; they're applied
+        before the next detection.
+
+        Arguments:
+            detection_width: Width the image is downscaled to before detection.
+            model_complexity: Complexity of the hand landmark model, 0 or 1.
+            max_num_hands: Maximum number of hands to detect.
+        """
+        self._pending_config = (detection_width, model_complexity, max_num_hands)
+
+    def _apply_config(self):
+        config, self._pending_config = self._pending_config, None
+        detection_width, model_complexity, max_num_hands = config
+
+        if detection_width is not None:
+            self._detection_width = detection_width
+
+        # The model and the buffers only change if they have to, since a new
+        # model loses the hands it was tracking.
+        recreate = False
+
+        if model_complexity is not None and model_complexity != self._model_complexity:
+            self._model_complexity = model_complexity
+            recreate = True
+
+        if max_num_hands is not None and max_num_hands != self._max_num_hands:
+            self._max_num_hands = max_num_hands
+            recreate = True
+
+        if recreate:
+            self._create_hands()
+
+            # Nothing the old model was tracking carries over.
+            self._track_handedness = []
+            self._roi = None
+            self._roi_frames = 0
 
     def find_hands(self, img, draw=False):
         """Finds hands in an image.
 
         Arguments:
-            frame: Image to detect hands in.
+            frame: RGB image to detect hands in.
             draw: Draw the output on the image.
 
         Return:
             Image.
         """
+        h, w = img.shape[:2]
 
-        img = cv.cvtColor(img, cv.COLOR_BGR2RGB)
+        if self._pending_config is not None:
+            self._apply_config()
 
-        # Prevents copying of image; increases process performance.
-        img.flags.writeable = False
+        if self._adaptive and self._predict_next():
+            self._predict_hands((h, w), img if draw else None)
+            return img
 
-        results = self._hands.process(img)
+        start = time.perf_counter()
 
-        img.flags.writeable = True
+        x0, y0, x1, y1 = self._roi if self._roi is not None else (0, 0, w, h)
+        roi = img[y0:y1, x0:x1]
+        roi_h, roi_w = roi.shape[:2]
 
-        img = cv.cvtColor(img, cv.COLOR_RGB2BGR)
+        # Downscale the region to the detection resolution; landmarks are
+        # normalized, so they map back to the full resolution region as is.
+        if self._detection_width is not None and roi_w > self._detection_width:
+            detect_img = cv.resize(
+                roi,
+                (self._detection_width, round(roi_h * self._detection_width / roi_w)),
+                interpolation=cv.INTER_AREA,
+            )
+        else:
+            detect_img = np.ascontiguousarray(roi)
 
-        h, w = img.shape[:2]
+        results = self._process(detect_img, (x0, y0, x1, y1))
+
+        num_hands = 0
 
         if results.multi_hand_landmarks:
-            for handedness, hand_landmarks in zip(
-                results.multi_handedness, results.multi_hand_landmarks
+            for i, (handedness, hand_landmarks) in enumerate(
+                zip(results.multi_handedness, results.multi_hand_landmarks)
             ):
-                hand = []
-                hand.append(handedness.classification[0].label)
-                hand.append([])
-                for landmark in list(hand_landmarks.landmark):
-                    hand[1].append(
-                        [
-                            min(int(landmark.x * w), w - 1),
-                            min(int(landmark.y * h), h - 1),
-                        ]
-                    )
-
-                self._hands_list.append(hand)
-
-                self._pre_processed_hands_list.append(
-                    # self._pre_process_landmarks((h, w), hand_landmarks)
-                    self._pre_process_landmarks(hand[1])
-                )
+                self._handedness[i] = handedness.classification[0].label
+                self._scores[i] = handedness.classification[0].score
+                self._landmarks_norm[i] = [
+                    (landmark.x, landmark.y) for landmark in hand_landmarks.landmark
+                ]
 
                 if draw:
+                    # Draw on the full resolution region of the image.
                     self._mp_drawing.draw_landmarks(
-                        img,
+                        roi,
                         hand_landmarks,
                         self._mp_hands.HAND_CONNECTIONS,
+                        self._landmark_drawing_spec,
                     )
 
+            num_hands = len(results.multi_hand_landmarks)
+            self._set_hands(num_hands, (h, w), (x0, y0, x1, y1))
+
+        if self._adaptive:
+            self._update_cadence(num_hands, (h, w), time.perf_counter() - start)
+
+        if self._roi_tracking:
+            self._update_roi(num_hands, (h, w))
 
         return img
 
-    def _pre_process_landmarks(self, hand_landmarks):
-        landmark_list = deepcopy(hand_landmarks)
+    def _process(self, detect_img, roi):
+        """Runs the hand landmark model.
+
+        Arguments:
+            detect_img: Image to detect hands in, the region possibly
+            downscaled.
+            roi: Region (x0, y0, x1, y1) of the full image detect_img shows.
 
-        # Convert to relative coordinates
-        b_x, b_y = 0, 0
+        Return:
+            MediaPipe hands results, the landmarks normalized to detect_img.
+        """
+        # Prevents copying of image; increases process performance.
+        detect_img.flags.writeable = False
 
-        for i, landmark_point in enumerate(landmark_list):
-            if i == 0:
-                b_x, b_y = landmark_point[0], landmark_point[1]
+        results = self._hands.process(detect_img)
 
-            landmark_list[i][0] = landmark_list[i][0] - b_x
-            landmark_list[i][1] = landmark_list[i][1] - b_y
-        
+        detect_img.flags.writeable = True
 
-        # Convert to a one-dimensional list/
-        landmark_list = list(chain.from_iterable(landmark_list))
-        
-        # Normalization
-        max_value = max(list(map(abs, landmark_list)))
+        return results
+
+    def _predict_next(self):
+        """Whether the next frame's hands are predicted instead of detected."""
+        return (
+            len(self._track_handedness) > 0
+            and self._frames_since_detect + 1 < self._interval
+        )
+
+    def _predict_hands(self, size, img=None):
+        """Extrapolates the last detected hands at constant velocity.
+
+        Arguments:
+            size: Size (h, w) of the image.
+            img: Image to draw the predicted landmarks on, or None.
+        """
+        h, w = size
+        n = len(self._track_handedness)
+
+        self._frames_since_detect += 1
+
+        np.copyto(
+            self._landmarks[:n],
+            self._track_landmarks + self._track_velocity * self._frames_since_detect,
+            casting="unsafe",
+        )
+        np.clip(self._landmarks[:n], 0, (w - 1, h - 1), out=self._landmarks[:n])
+
+        self._handedness[:n] = self._track_handedness
+        self._scores[:n] = self._track_scores
+
+        self._publish_hands(n)
+
+        if img is not None:
+            for landmarks in self._landmarks[:n]:
+                for start, end in self._mp_hands.HAND_CONNECTIONS:
+                    cv.line(
+                        img,
+                        tuple(map(int, landmarks[start])),
+                        tuple(map(int, landmarks[end])),
+                        (224, 224, 224),
+                        2,
+                    )
+
+                for landmark in landmarks:
+                    cv.circle(img, tuple(map(int, landmark)), 2, (255, 0, 0), -1)
+
+    def _update_cadence(self, num_hands, size, detect_time):
+        """Updates the hands' velocity and how often the detector runs.
+
+        Arguments:
+            num_hands: Number of hands found in this frame.
+            size: Size (h, w) of the image.
+            detect_time: Seconds the detection took.
+        """
+        h, w = size
+        frames = self._frames_since_detect + 1
+        self._frames_since_detect = 0
+
+        landmarks = self._landmarks[:num_hands].astype(np.float32)
+        handedness = list(self._handedness[:num_hands])
+
+        # Only hands that were seen last time have a velocity.
+        tracked = num_hands > 0 and handedness == self._track_handedness
+
+        if tracked:
+            self._track_velocity = (landmarks - self._track_landmarks) / frames
+        else:
+            self._track_velocity = np.zeros_like(landmarks)
+
+        self._track_landmarks = landmarks
+        self._track_handedness = handedness
+        self._track_scores = self._scores[:num_hands].copy()
+
+        # Detect again right away until the hands' velocity is known.
+        if not tracked:
+            self._interval = 1
+            return
+
+        # The faster the hands move, the more often they are detected.
+        speed = np.abs(self._track_velocity).max() / hypot(w, h)
+        t = (speed - ADAPTIVE_SLOW_SPEED) / (ADAPTIVE_FAST_SPEED - ADAPTIVE_SLOW_SPEED)
+        t = min(max(t, 0), 1)
+        interval = round(self._max_interval - t * (self._max_interval - 1))
+
+        # Run the detector rarely enough that it fits in the frame budget.
+        self._detect_time = (
+            detect_time
+            if self._detect_time is None
+            else 0.8 * self._detect_time + 0.2 * detect_time
+        )
+
+        if self._frame_budget:
+            interval = max(interval, ceil(self._detect_time / self._frame_budget))
+
+        self._interval = min(interval, self._max_interval)
+
+    def _update_roi(self, num_hands, size):
+        """Picks the region the next frame's hands are detected in.
 
-        def normalize_(n):
-            return n / max_value
+        The region only moves when a hand gets close to its edge, since every
+        move shifts the coordinates MediaPipe tracks the hands in.
 
-        landmark_list = list(map(normalize_, landmark_list))
+        Arguments:
+            num_hands: Number of hands found in this frame.
+            size: Size (h, w) of the image.
+        """
+        h, w = size
+        self._roi_frames += 1
+
+        if num_hands == 0 or self._roi_frames >= self._roi_full_interval:
+            self._roi = None
+            self._roi_frames = 0
+            return
+
+        landmarks = self._landmarks[:num_hands].reshape(-1, 2)
+        bx0, by0 = landmarks.min(axis=0)
+        bx1, by1 = landmarks.max(axis=0) + 1
+
+        if self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+
+            # Padding the region was given around the hands on each side.
+            pad_x = (x1 - x0) * self._roi_margin / (2 * (1 + self._roi_margin))
+            pad_y = (y1 - y0) * self._roi_margin / (2 * (1 + self._roi_margin))
+
+            # Keep the region while the hands use up less than half of it.
+            if (
+                bx0 >= x0 + pad_x / 2
+                and by0 >= y0 + pad_y / 2
+                and bx1 <= x1 - pad_x / 2
+                and by1 <= y1 - pad_y / 2
+            ):
+                return
+
+        # A square region keeps the hands' proportions for the detector; it
+        # is kept large enough that a moving hand doesn't leave it at once.
+        side = max(bx1 - bx0, by1 - by0) * (1 + self._roi_margin)
+        side = max(side, min(h, w) / 3)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+
+        x0, x1 = int(max(cx - side / 2, 0)), int(min(cx + side / 2, w))
+        y0, y1 = int(max(cy - side / 2, 0)), int(min(cy + side / 2, h))
+
+        # Not worth cropping if the region covers most of the image.
+        if (x1 - x0) * (y1 - y0) > 0.6 * w * h:
+            self._roi = None
+        else:
+            self._roi = (x0, y0, x1, y1)
+
+    def _set_hands(self, num_hands, size, roi=None):
+        """Converts the normalized landmarks of the detected hands to pixels
+        and pre-processes them for the gesture classifier.
+
+        Arguments:
+            num_hands: Number of detected hands.
+            size: Size (h, w) of the image the hands were detected in.
+            roi: Region (x0, y0, x1, y1) of the image the landmarks are
+            normalized to, or None for the whole image.
+        """
+        h, w = size
+        n = num_hands
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, w, h)
+
+        # Map back to the image, truncate to pixels and keep the landmarks
+        # within the image.
+        np.copyto(
+            self._landmarks[:n],
+            self._landmarks_norm[:n] * (x1 - x0, y1 - y0) + (x0, y0),
+            casting="unsafe",
+        )
+        np.clip(
+            self._landmarks[:n], 0, (w - 1, h - 1), out=self._landmarks[:n]
+        )
+
+        self._publish_hands(n)
+
+    def _publish_hands(self, num_hands):
+        """Makes the first hands in the buffers the detected ones.
+
+        Arguments:
+            num_hands: Number of hands.
+        """
+        n = num_hands
+
+        self._num_hands = n
+        self._hands_list = [
+            [self._handedness[i], self._landmarks[i]] for i in range(n)
+        ]
+        self._pre_processed_hands_list = self._pre_process_landmarks(
+            self._landmarks[:n]
+        )
+
+    def _pre_process_landmarks(self, landmarks):
+        """Makes the landmarks relative to the wrist and normalizes them.
+
+        Arguments:
+            landmarks: Landmarks of each hand in pixels, (N, 21, 2).
+
+        Return:
+            Pre-processed landmarks of each hand, (N, 42).
+        """
+        n = len(landmarks)
+
+        # Convert to coordinates relative to the wrist, one row per hand.
+        landmark_list = (landmarks - landmarks[:, :1]).reshape(n, 42).astype(np.float32)
+
+        # Normalization
+        max_value = np.abs(landmark_list).max(axis=1, keepdims=True)
+        landmark_list /= np.maximum(max_value, 1)
 
         return landmark_list
 
@@ -135,6 +479,128 @@ class HandDetector:
         dist = hypot(x2 - x1, y2 - y1)
         return dist
 
+    def get_hands(self):
+        """Gets a copy of the detected hands that stays valid after the next
+        detection.
+
+        Return:
+            [handedness, landmarks] of each hand and their pre-processed
+            landmarks.
+        """
+        landmarks = self.get_landmarks().copy()
+        hands_list = [
+            [handedness, landmarks[i]]
+            for i, handedness in enumerate(self.get_handedness())
+        ]
+
+        return hands_list, self._pre_processed_hands_list.copy()
+
+    def get_model_complexity(self):
+        return self._model_complexity
+
+    def get_max_num_hands(self):
+        return self._max_num_hands
+
+    def get_detection_width(self):
+        return self._detection_width
+
+    def get_interval(self):
+        return self._interval
+
+    def set_frame_budget(self, seconds):
+        self._frame_budget = seconds
+
+    def get_num_hands(self):
+        return self._num_hands
+
+    def get_landmarks(self):
+        return self._landmarks[: self._num_hands]
+
+    def get_handedness(self):
+        return self._handedness[: self._num_hands]
+
+    def get_scores(self):
+        return self._scores[: self._num_hands]
+
+    def get_pre_processed_landmarks(self):
+        return self._pre_processed_hands_list
+
+    def close(self):
+        self._hands.close()
+
     def reset_hands_list(self):
+        self._num_hands = 0
         self._hands_list = []
-        self._pre_processed_hands_list = []
+        self._pre_processed_hands_list = self._pre_processed_hands_list[:0]
+
+
+class SyntheticHandDetector(HandDetector):
+    def __init__(self, source, mirrored=True, **kwargs):
+        """Initializes a hand detector that takes the hands in the frames of
+        a synthetic source from its ground truth instead of the model.
+
+        Everything else, the downscaling, region tracking and adaptive
+        cadence, and the gestures after it, run as with the model, so
+        synthetic runs exercise the whole gesture path.
+
+        Arguments:
+            source: SyntheticSource the frames come from.
+            mirrored: Whether the frames are mirrored before detection.
+            kwargs: Arguments of HandDetector.
+        """
+        self._source = source
+        self._mirrored = mirrored
+        self._frame_index = 0
+        self._frame_width = 0
+
+        super().__init__(**kwargs)
+
+    def _create_hands(self):
+        # There is no model, only the buffers.
+        self._create_buffers()
+
+    def find_hands(self, img, draw=False):
+        self._frame_index = read_frame_index(img, self._mirrored)
+        self._frame_width = img.shape[1]
+
+        return super().find_hands(img, draw)
+
+    def _process(self, detect_img, roi):
+        x0, y0, x1, y1 = roi
+        _, landmarks = self._source.get_pose(self._frame_index)
+
+        if self._mirrored:
+            landmarks = landmarks * (-1, 1) + (self._frame_width, 0)
+
+        results = SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+
+        # Like the model, only find the hand if it's within the region.
+        cx, cy = landmarks.mean(axis=0)
+
+        if not (x0 <= cx < x1 and y0 <= cy < y1):
+            return results
+
+        # The rendered hand is a right hand as the camera sees it; the
+        # labels assume a mirrored image.
+        label = "Right" if self._mirrored else "Left"
+        norm = (landmarks - (x0, y0)) / (x1 - x0, y1 - y0)
+
+        results.multi_hand_landmarks = [
+            landmark_pb2.NormalizedLandmarkList(
+                landmark=[
+                    landmark_pb2.NormalizedLandmark(x=x, y=y, z=0.0) for x, y in norm
+                ]
+            )
+        ]
+        results.multi_handedness = [
+            classification_pb2.ClassificationList(
+                classification=[
+                    classification_pb2.Classification(index=1, score=1.0, label=label)
+                ]
+            )
+        ]
+
+        return results
+
+    def close(self):
+        pass
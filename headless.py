@@ -0,0 +1,415 @@
+"""Runs Float without a GUI: captures the camera, applies the hands' gestures
+to the float images of a scene and writes the result to a v4l2loopback device
+or a video file.
+
+The scene is a JSON list of float images, each with a "path" and optionally
+its "x", "y" and "width" in pixels:
+
+    [{"path": "assets/images/shapes/001.png", "x": 40, "y": 40}]
+
+Usage:
+    python headless.py --scene scene.json --output /dev/video10
+    python headless.py --scene scene.json --output out.mp4 --frames 300
+    python headless.py --source synthetic --ground-truth-hands --output out.mp4
+"""
+import argparse
+import json
+import threading
+import time
+import cv2 as cv
+import numpy as np
+from constants import *
+from capture import Capture, mirror_to_rgb
+from hand_detector import HandDetector, SyntheticHandDetector
+from detector_process import HandDetectorProcess
+from gesture_classfier import GestureClassifier
+from gestures import GestureHandler
+from float_image import FloatImage
+from asset_cache import asset_cache
+from compositor import Compositor
+from frame_sources import SyntheticSource
+from frame_stats import FrameStats
+from pipeline import Pipeline
+from scene import Scene
+from virtual_cam import VirtualCamSender
+
+
+def load_scene(path, cap_w):
+    """Loads the float images of a scene description.
+
+    Arguments:
+        path: Path of the scene's JSON file.
+        cap_w: Width of the captured frames.
+
+    Return:
+        Scene of the float images, the first one at the bottom.
+    """
+    with open(path) as f:
+        overlays = json.load(f)
+
+    scene = Scene()
+
+    for overlay in overlays:
+        float_image = FloatImage(overlay["path"], cap_w=cap_w)
+
+        if "width" in overlay:
+            float_image.set_img_width(overlay["width"])
+
+        float_image.set_pos_x(overlay.get("x", float_image.get_pos_x()))
+        float_image.set_pos_y(overlay.get("y", float_image.get_pos_y()))
+
+        scene.add(float_image)
+
+    return scene
+
+
+class VideoFileOutput:
+    def __init__(self, path, width, height, fps):
+        """Initializes an output that writes every frame to a video file.
+
+        Arguments:
+            path: Path of the video file.
+            width: Frame width.
+            height: Frame height.
+            fps: Frame rate the video is played back at.
+        """
+        self._writer = cv.VideoWriter(
+            path, cv.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+        )
+
+        if not self._writer.isOpened():
+            raise IOError(f"Cannot write video file: {path}")
+
+        self._frame_bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self._written = 0
+
+    def submit(self, frame):
+        cv.cvtColor(frame, cv.COLOR_RGB2BGR, dst=self._frame_bgr)
+        self._writer.write(self._frame_bgr)
+        self._written += 1
+
+    def get_stats(self):
+        return {"written": self._written}
+
+    def close(self):
+        self._writer.release()
+
+
+class HeadlessRunner:
+    def __init__(
+        self,
+        cap,
+        output,
+        scene,
+        hand_detector,
+        gesture_classifier,
+        stats,
+        gesture_control=True,
+        compositor_workers=None,
+    ):
+        """Initializes the capture, gesture and output pipeline without a GUI.
+
+        Arguments:
+            cap: Threaded capture source.
+            output: Output the composited RGB frames are submitted to.
+            scene: Scene of the float images.
+            hand_detector: Hand detector.
+            gesture_classifier: Gesture classifier.
+            stats: Frame statistics.
+            gesture_control: Apply the hands' gestures to the float images.
+            compositor_workers: Number of threads blending the overlays, None
+            for one per core or 1 to blend serially.
+        """
+        self._cap = cap
+        self._output = output
+        self._scene = scene
+        self._hand_detector = hand_detector
+        self._gesture_classifier = gesture_classifier
+        self._gesture_handler = GestureHandler(hand_detector)
+        self._compositor = Compositor(workers=compositor_workers)
+        self._stats = stats
+        self._gesture_control = gesture_control
+        self._read = 0
+        self._frames = 0
+        self._max_frames = None
+        self._done = threading.Event()
+
+        # Recorded sources played as fast as possible are read frame by
+        # frame, so every read frame gets processed too.
+        self._pipeline = Pipeline(
+            self._pipeline_capture,
+            [self._pipeline_detect, self._pipeline_compose],
+            queue_size=PIPELINE_QUEUE_SIZE,
+            blocking=cap.is_recorded() and not cap.is_realtime(),
+        )
+
+    def _pipeline_capture(self):
+        if not self._cap.wait_new_frame(timeout=1.0):
+            # The source is gone; a headless run doesn't wait for it, but
+            # finishes the frames it already read.
+            self._pipeline.end()
+            return None
+
+        with self._stats.time("capture"):
+            success, frame = self._cap.read()
+
+        if not success:
+            return None
+
+        self._read += 1
+
+        return frame
+
+    def _pipeline_detect(self, frame):
+        with self._stats.time("prepare"):
+            frame = mirror_to_rgb(frame)
+
+        if not (self._scene and self._gesture_control):
+            return frame, ([], np.zeros((0, 42), dtype=np.float32))
+
+        self._hand_detector.reset_hands_list()
+
+        with self._stats.time("detect"):
+            frame = self._hand_detector.find_hands(frame)
+
+        return frame, self._hand_detector.get_hands()
+
+    def _pipeline_compose(self, item):
+        # Frames still in the pipeline once the frame limit is reached are
+        # dropped.
+        if self._done.is_set():
+            return None
+
+        frame, (hands_list, pre_processed_hands_list) = item
+
+        with self._stats.time("composite"):
+            frame = self._compositor.draw_scene(frame, self._scene)
+
+        if self._scene and self._gesture_control:
+            with self._stats.time("classify"):
+                gestures, _ = self._gesture_classifier.classify(
+                    pre_processed_hands_list
+                )
+
+            self._gesture_handler.apply(
+                frame, self._scene, hands_list, gestures
+            )
+
+        self._output.submit(frame)
+
+        self._stats.end_frame()
+        self._frames += 1
+
+        if self._max_frames is not None and self._frames >= self._max_frames:
+            self._done.set()
+
+        return None
+
+    def run(self, frames=None, duration=None):
+        """Runs the pipeline until it has processed a number of frames, a
+        duration has passed, the source ends or it is interrupted.
+
+        Arguments:
+            frames: Number of frames to process, or None for no limit.
+            duration: Seconds to run for, or None for no limit.
+
+        Return:
+            Number of processed frames.
+        """
+        start = time.perf_counter()
+
+        self._max_frames = frames
+        self._pipeline.start()
+
+        try:
+            while not self._done.wait(0.05):
+                if self._pipeline.is_drained():
+                    break
+
+                if duration is not None and time.perf_counter() - start >= duration:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._pipeline.stop()
+            self._compositor.close()
+
+        return self._frames
+
+    def get_read(self):
+        """Gets the number of frames read from the source."""
+        return self._read
+
+    def get_dropped(self):
+        """Gets the number of read frames dropped between the stages."""
+        return sum(self._pipeline.get_dropped())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Runs Float without a GUI.",
+    )
+    parser.add_argument(
+        "--source",
+        default="0",
+        help="camera index, video file, directory or glob of images, or "
+        '"synthetic" (default: 0)',
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="play recorded sources as fast as possible instead of in real time",
+    )
+    parser.add_argument(
+        "--loop", action="store_true", help="start recorded sources over when they end"
+    )
+    parser.add_argument("--width", type=int, help="requested capture width")
+    parser.add_argument("--height", type=int, help="requested capture height")
+    parser.add_argument("--fps", type=int, help="requested capture frame rate")
+    parser.add_argument(
+        "--scene", help="JSON list of the float images to show"
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="v4l2loopback device (/dev/videoN) or video file to write",
+    )
+    parser.add_argument(
+        "--frames", type=int, help="stop after this many frames"
+    )
+    parser.add_argument(
+        "--duration", type=float, help="stop after this many seconds"
+    )
+    parser.add_argument(
+        "--stats", help="file the frame statistics are appended to as JSON lines"
+    )
+    parser.add_argument(
+        "--no-gestures",
+        action="store_true",
+        help="don't detect hands or apply gestures",
+    )
+    parser.add_argument(
+        "--compositor-workers",
+        type=int,
+        help="threads blending the overlays, 1 to blend serially "
+        "(default: one per core)",
+    )
+    parser.add_argument(
+        "--detector-process",
+        action="store_true",
+        help="run the hand detector in its own process",
+    )
+    parser.add_argument(
+        "--ground-truth-hands",
+        action="store_true",
+        help="with --source synthetic, take the hands from the rendered "
+        "ground truth instead of the model",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    cap = Capture(
+        int(args.source) if args.source.isdigit() else args.source,
+        threaded=True,
+        width=args.width,
+        height=args.height,
+        fps=args.fps,
+        realtime=not args.fast,
+        loop=args.loop,
+    )
+    width, height = cap.get_width(), cap.get_height()
+    fps = cap.get_fps() or 30
+
+    if not cap.has_new_frame():
+        raise SystemExit(f"Capture source not available: {args.source}")
+
+    stats = FrameStats(export_path=args.stats)
+    stats.set_enabled(True)
+
+    detector_kwargs = dict(
+        detection_width=DETECTION_WIDTH,
+        roi_tracking=DETECTION_ROI_TRACKING,
+        adaptive=DETECTION_ADAPTIVE,
+        frame_budget=1 / fps,
+    )
+    if args.ground_truth_hands:
+        if not isinstance(cap.get_source(), SyntheticSource):
+            raise SystemExit("--ground-truth-hands needs --source synthetic")
+
+        hand_detector = SyntheticHandDetector(cap.get_source(), **detector_kwargs)
+    elif args.detector_process:
+        hand_detector = HandDetectorProcess(
+            max_latency=DETECTION_PROCESS_LATENCY / fps, **detector_kwargs
+        )
+    else:
+        hand_detector = HandDetector(**detector_kwargs)
+
+    scene = load_scene(args.scene, width) if args.scene else Scene()
+
+    if args.output.startswith("/dev/video"):
+        # Only needed, and only installable, where there is a virtual camera.
+        import pyvirtualcam
+
+        cam = pyvirtualcam.Camera(
+            width=width,
+            height=height,
+            fps=fps,
+            fmt=pyvirtualcam.PixelFormat.RGB,
+            device=args.output,
+            backend="v4l2loopback",
+        )
+        output = VirtualCamSender(cam, stats)
+        output.start()
+    else:
+        cam = None
+        output = VideoFileOutput(args.output, width, height, fps)
+
+    stats.set_info("output", output.get_stats)
+    stats.set_info("assets", asset_cache.get_stats)
+
+    runner = HeadlessRunner(
+        cap,
+        output,
+        scene,
+        hand_detector,
+        GestureClassifier(),
+        stats,
+        gesture_control=not args.no_gestures,
+        compositor_workers=args.compositor_workers,
+    )
+
+    start = time.perf_counter()
+    frames = runner.run(frames=args.frames, duration=args.duration)
+    elapsed = time.perf_counter() - start
+
+    if cam is not None:
+        output.stop()
+        cam.close()
+    else:
+        output.close()
+
+    cap.release()
+    hand_detector.close()
+
+    print(
+        json.dumps(
+            {
+                "frames": frames,
+                "read": runner.get_read(),
+                "dropped": runner.get_dropped(),
+                "fps": frames / elapsed if elapsed > 0 else 0.0,
+                "stages": stats.percentiles(),
+                "output": output.get_stats(),
+                "assets": asset_cache.get_stats(),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 from ctypes import windll
 import cv2 as cv
 import numpy as np
@@ -9,18 +11,30 @@ import pyvirtualcam
 from regex import E
 from constants import *
 from hand_detector import HandDetector
-from capture import Capture
+from detector_process import HandDetectorProcess
+from capture import Capture, mirror_to_rgb
 from gesture_classfier import GestureClassifier
+from gestures import GestureHandler
 from float_image import FloatImage
+from asset_cache import asset_cache
+from compositor import Compositor
+from frame_stats import FrameStats
+from pipeline import Pipeline
+from scene import Scene
+from quality import QualityController
+from virtual_cam import VirtualCamSender
 
 
 class App(tk.Tk):
-    def __init__(self, cam, cap_src=0):
+    def __init__(self, cam, cap_src=0, stats_path=None, detector_process=False):
         """Initializes the app.
 
         Arguments:
             cam: Virtual cam source.
             cap_src: Capture source.
+            stats_path: File the frame statistics are exported to as JSON
+            lines, or None to not export them.
+            detector_process: Run the hand detector in a separate process.
         """
 
         tk.Tk.__init__(self)
@@ -49,12 +63,15 @@ class App(tk.Tk):
         self.configure(bg=COLOR_GRAY)
 
         # Initialize variables.
-        self._init_variables(cam, cap_src)
+        self._init_variables(cam, cap_src, stats_path, detector_process)
 
         # Initialize GUI.
         self._init_gui()
 
-        self._update_capture()
+        self._sender.start()
+        self._pipeline.start()
+
+        self._update_preview()
 
         self.after(10, lambda: self._set_appwindow())
 
@@ -76,275 +93,323 @@ class App(tk.Tk):
             "mycompany.myproduct.subproduct.version"
         )
 
-    def _update_capture(self):
-
-        success, frame = self._cap.read()
-
-        ms = 10
+    def _update_preview(self):
+        # The frames are processed by the pipeline's threads; the Tk thread
+        # only shows the most recent finished preview frame.
+        if not self._cap_detected:
+            self._preview_message("Camera Not Detected", 190)
+        elif not self.is_dragging():
+            if self._cam_preview:
+                frame_preview = self._pipeline.get_output().get_latest()
 
-        if success:
-            if not self.is_dragging():
+                if frame_preview is not None:
+                    with self._stats.time("display"):
+                        self._preview_show(frame_preview)
+            else:
+                self._preview_message("Preview disabled", 216)
 
-                def frame_resize(img):
-                    # Resizes the image by maintaining the aspect ratio by determining what is
-                    # the percentage of the height relative to the original height in pixels.
-                    # And then multiplying the original the original width to that percentage.
-                    base_height = CAPTURE_HEIGHT
-                    height_percent = base_height / float(img.size[1])
-                    width = int((float(img.size[0]) * float(height_percent)))
-                    return img.resize((width, base_height), Image.ANTIALIAS)
+        self.after(self._preview_interval, self._update_preview)
 
-                self._hand_detector.reset_hands_list()
+    def _preview_show(self, frame_preview):
+        """Shows a preview frame, reusing the canvas item and its image.
 
-                frame_raw = self._hand_detector.find_hands(
-                    cv.flip(frame, 1), self._hand_landmarks
+        Arguments:
+            frame_preview: Downscaled RGB frame.
+        """
+        h, w = frame_preview.shape[:2]
+
+        # The image only gets replaced if the camera's resolution changes,
+        # otherwise its pixels are updated in place.
+        if self._preview_photo is None or (
+            self._preview_photo.width(),
+            self._preview_photo.height(),
+        ) != (w, h):
+            self._preview_photo = ImageTk.PhotoImage("RGB", (w, h))
+
+            if self._preview_item is None:
+                self._preview_item = self._canvas_camera.create_image(
+                    0, 0, image=self._preview_photo, anchor=tk.NW
+                )
+            else:
+                self._canvas_camera.itemconfigure(
+                    self._preview_item, image=self._preview_photo
                 )
 
-                frame = frame_raw.copy()
-
-                if self._float_images:
-                    for float_image in self._float_images:
-                        frame = self._img_draw(frame, float_image)
+            self._canvas_camera.coords(
+                self._preview_item, max((CAPTURE_WIDTH - w) // 2, 0), 0
+            )
 
-                frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+        self._preview_photo.paste(Image.fromarray(frame_preview))
 
-                if self._float_images:
-                    if self._gesture_control:
-                        self._check_gestures(frame)
+        self._canvas_camera.itemconfigure(self._preview_item, state=tk.NORMAL)
 
-                if self._cam_preview:
-                    if self._virtual_cam.device:
-                        # Send frame to the virtual camera.
-                        self._virtual_cam.send(frame)
+        if self._preview_text is not None:
+            self._canvas_camera.itemconfigure(self._preview_text, state=tk.HIDDEN)
 
-                        self._virtual_cam.sleep_until_next_frame()
-                    if self._float_images:
-                        for float_image in self._float_images:
-                            frame = self._img_draw(frame_raw, float_image)
-                        frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+    def _preview_message(self, text, x):
+        """Shows a message instead of the preview.
 
-                    # frame = cv.flip(frame, 1)
+        Arguments:
+            text: Message.
+            x: Horizontal position of the message.
+        """
+        if self._preview_item is not None:
+            self._canvas_camera.itemconfigure(self._preview_item, state=tk.HIDDEN)
 
-                    frame_arr = Image.fromarray(frame)
-                    frame_arr = frame_resize(frame_arr)
-                    self._cap_frame = ImageTk.PhotoImage(image=frame_arr)
-                    if self._cap_frame.height() != CAPTURE_WIDTH:
-                        self._canvas_camera.create_image(
-                            ((CAPTURE_WIDTH // 2) - (frame_arr.size[0] // 2)),
-                            0,
-                            image=self._cap_frame,
-                            anchor=tk.NW,
-                        )
-                    else:
-                        self._canvas_camera.create_image(
-                            0, 0, image=self._cap_frame, anchor=tk.NW
-                        )
-                else:
-                    self._canvas_camera.delete(tk.ALL)
-                    self._canvas_camera.create_text(
-                        216,
-                        184,
-                        text="Preview disabled",
-                        fill=COLOR_WHITE,
-                        font="Consolas 24",
-                        anchor=tk.NW,
-                    )
-        else:
-            self._canvas_camera.delete(tk.ALL)
-            self._canvas_camera.create_text(
-                190,
+        if self._preview_text is None:
+            self._preview_text = self._canvas_camera.create_text(
+                x,
                 184,
-                text="Camera Not Detected",
+                text=text,
                 fill=COLOR_WHITE,
                 font="Consolas 24",
                 anchor=tk.NW,
             )
+        else:
+            self._canvas_camera.itemconfigure(
+                self._preview_text, text=text, state=tk.NORMAL
+            )
+            self._canvas_camera.coords(self._preview_text, x, 184)
 
-            self._cap = Capture()
+    def _pipeline_capture(self):
+        """Pipeline source; waits for the camera's next frame.
 
-            ms = 1000
+        Return:
+            Captured BGR frame, or None if the camera is not detected.
+        """
+        success = self._cap.wait_new_frame(timeout=1.0)
 
-        self.after(ms, self._update_capture)
+        if success:
+            # Only time the stages while the statistics are shown or exported.
+            self._stats.set_enabled(self._frame_stats)
 
-    def _check_gestures(self, frame):
-        # drag doesnt work if two hands
-        for i, hand in enumerate(self._hand_detector._hands_list):
-            gesture = self._gesture_classifier(
-                self._hand_detector._pre_processed_hands_list[i]
-            )
+            with self._stats.time("capture"):
+                success, frame = self._cap.read()
 
-            if gesture == GESTURE_DRAG:
-                # Make index finger the cursor.
-                cursor = self._hand_detector.get_midpoint(
-                    hand[1][MIDDLE_FINGER_TIP], hand[1][INDEX_FINGER_TIP]
-                )
+        if not success:
+            self._cap_detected = False
 
-                # Check if a float image is currenly being dragged.
+            if self._pipeline.is_running():
+                self._cap.release()
+                self._cap = Capture(self._cap_src, threaded=True, loop=True)
 
-                dragging_float_image = next(
-                    (
-                        float_image
-                        for float_image in self._float_images
-                        if float_image._dragging == hand[0]
-                    ),
-                    None,
-                )
+                if not self._cap.has_new_frame():
+                    time.sleep(1.0)
 
-                if dragging_float_image:
+            return None
 
-                    if len(self._hand_detector._hands_list) > 1:
-                        if dragging_float_image._resizing:
+        self._cap_detected = True
 
-                            cursor = self._hand_detector.get_midpoint(
-                                hand[1][MIDDLE_FINGER_TIP], hand[1][INDEX_FINGER_TIP]
-                            )
+        return frame
 
-                            other_cursor = self._hand_detector._hands_list[(i + 1) % 2][
-                                1
-                            ][INDEX_FINGER_TIP]
+    def _pipeline_detect(self, frame):
+        """Pipeline stage; finds the hands in a captured frame.
 
-                            dragging_float_image.resize(
-                                frame,
-                                cursor, 
-                                other_cursor,
-                                int(self._hand_detector.get_distance(cursor, other_cursor)),
-                            )
+        Arguments:
+            frame: Captured BGR frame.
 
-                            continue
+        Return:
+            RGB frame and a snapshot of the hands found in it.
+        """
+        start = time.perf_counter()
 
-                    dragging_float_image.drag(frame, cursor)
+        with self._stats.time("prepare"):
+            frame = self._frame_prepare(frame)
 
-                    if len(self._hand_detector._hands_list) > 1:
+        if not self._detection_needed():
+            self._detect_cost = time.perf_counter() - start
+            return frame, ([], np.zeros((0, 42), dtype=np.float32))
 
-                        other_hand_gesture = self._gesture_classifier(
-                            self._hand_detector._pre_processed_hands_list[(i + 1) % 2]
-                        )
+        self._hand_detector.reset_hands_list()
 
-                        if other_hand_gesture == GESTURE_POINTER:
-                            cursor = self._hand_detector.get_midpoint(
-                                hand[1][MIDDLE_FINGER_TIP], hand[1][INDEX_FINGER_TIP]
-                            )
+        with self._stats.time("detect"):
+            frame = self._hand_detector.find_hands(frame, self._hand_landmarks)
 
-                            other_cursor = self._hand_detector._hands_list[(i + 1) % 2][
-                                1
-                            ][INDEX_FINGER_TIP]
+        hands = self._hand_detector.get_hands()
 
-                            dragging_float_image.resize_start(cursor, other_cursor)
+        if hands[0]:
+            self._hand_seen_time = time.perf_counter()
 
-                # Otherwise pick an image to be dragged
-                else:
-                    for float_image in self._float_images:
-                        succ = float_image.drag_start(hand[0], cursor)
+        self._detect_cost = time.perf_counter() - start
 
-                        if succ:
-                            break
+        return frame, hands
 
-                continue
+    def _detection_needed(self):
+        """Decides whether hands are detected in the current frame.
 
-            if len(self._hand_detector._hands_list) > 1:
-                if gesture == GESTURE_DELETE:
-                    other_hand = self._hand_detector._hands_list[(i + 1) % 2]
+        Nothing is detected when there is nothing to interact with. When no
+        hand has been seen for a while, detection only probes occasionally
+        until a hand shows up again.
 
-                    other_hand_gesture = self._gesture_classifier(
-                        self._hand_detector._pre_processed_hands_list[(i + 1) % 2]
-                    )
+        Return:
+            Whether to detect hands.
+        """
+        if self._hand_landmarks:
+            return True
 
-                    if other_hand_gesture == GESTURE_POINTER:
-                        cursor = other_hand[1][INDEX_FINGER_TIP]
+        if not (self._scene and self._gesture_control):
+            return False
 
-                        for i in range(len(self._float_images)):
-                            succ = self._float_images[i].delete(cursor)
+        now = time.perf_counter()
 
-                            if succ:
-                                self._float_images.pop(i)
-                                break
+        if now - self._hand_seen_time < IDLE_TIMEOUT:
+            return True
 
-            for float_image in self._float_images:
-                if float_image._dragging == hand[0]:
-                    float_image._dragging = None
-                    float_image._resizing = None
+        if now - self._probe_time >= IDLE_PROBE_INTERVAL:
+            self._probe_time = now
+            return True
 
-    def _img_draw(self, frame, float_image, flip=False):
-        def overlay_transparent(bg, fg, pos=(0, 0)):
-            """Overlays a png image over a jpg image.
+        return False
 
-            Arguments:
-                bg: Background image.
-                fg: Foreground image.
-                pos: Position of foreground over the background.
+    def _pipeline_compose(self, item):
+        """Pipeline stage; applies the gestures, composes the overlays and
+        sends the result to the virtual camera.
 
-            Return:
-                Background image overlayed with the foreground image.
-            """
+        Arguments:
+            item: RGB frame and a snapshot of the hands found in it.
 
-            bg_h, bg_w, bg_c = bg.shape
-            fg_h, fg_w = fg.shape[:2]
-            pos_x, pos_y = pos
+        Return:
+            Downscaled frame for the preview, or None if it is disabled.
+        """
+        frame, (hands_list, pre_processed_hands_list) = item
 
-            # Create mask from alpha.
-            *_, fg_alpha = cv.split(fg)
+        with self._scene_lock:
+            # Compose the overlays once; the virtual camera and the preview
+            # both read from this frame.
+            with self._stats.time("composite"):
+                frame = self._scene_draw(frame)
 
-            # Convert mask from foreground to BGRA which
-            # is the same size as the foreground to
-            # be able to use bitwise operation.
-            fg_mask_bgra = cv.cvtColor(fg_alpha, cv.COLOR_GRAY2BGRA)
-            fg_rgba = cv.bitwise_and(fg, fg_mask_bgra)
+            if self._scene:
+                if self._gesture_control:
+                    self._check_gestures(frame, hands_list, pre_processed_hands_list)
 
-            # Convert image to BGR which is the same size
-            # as the background mask to be able to use
-            # bitwise operation.
-            fg_rgb = cv.cvtColor(fg_rgba, cv.COLOR_BGRA2BGR)
+        if self._virtual_cam.device:
+            # The sender's thread paces the virtual camera; composing never
+            # waits for it.
+            self._sender.submit(frame)
 
-            # Create a blank image of the same size
-            # with the background for the full foreground mask.
-            fg_mask_full = np.zeros((bg_h, bg_w, bg_c), np.uint8)
+        frame_preview = None
 
-            # Replace full foreground mask at the given position
-            # with the RGB foreground.
-            fg_mask_full[pos_y : pos_y + fg_h, pos_x : pos_x + fg_w] = fg_rgb
+        if self._cam_preview and self._preview_due():
+            with self._stats.time("preview"):
+                # The preview only needs a downscaled view of the composite.
+                frame_preview = self._preview_resize(frame)
 
-            # Convert mask from foreground to BGR which
-            # is the same size as the background to
-            # be able to use bitwise operation.
-            fg_mask_bgr = cv.cvtColor(fg_alpha, cv.COLOR_GRAY2BGR)
+                if self._frame_stats:
+                    self._stats.draw(frame_preview)
 
-            # Invert mask.
-            fg_mask_bgr_inv = cv.bitwise_not(fg_mask_bgr)
+        if self._quality is not None:
+            # The quality levels only make detection cheaper; lowering them
+            # when compositing is the bottleneck would cost quality for
+            # nothing.
+            self._quality.update(self._detect_cost)
 
-            # Create a blank image of the same size with the background.
-            bg_mask_full = np.ones((bg_h, bg_w, bg_c), np.uint8) * 255
+        self._stats.end_frame()
 
-            # Replace full background mask at the given position
-            # with the RGB foreground.
-            bg_mask_full[pos_y : pos_y + fg_h, pos_x : pos_x + fg_w] = fg_mask_bgr_inv
+        return frame_preview
 
-            # Mask background.
-            bg_masked = cv.bitwise_and(bg, bg_mask_full)
+    def _preview_due(self):
+        """Decides whether the current frame is downscaled for the preview,
+        so the preview runs at its own rate rather than the camera's.
 
-            # Put the masked foreground to the masked background.
-            img = cv.bitwise_or(bg_masked, fg_mask_full)
+        Return:
+            Whether the preview is due.
+        """
+        now = time.perf_counter()
 
-            return img
+        if now - self._preview_time < self._preview_interval / 1000:
+            return False
 
-        x, y = float_image.get_pos_x(), float_image.get_pos_y()
+        self._preview_time = now
 
-        if float_image.is_png():
-            frame[:] = overlay_transparent(
-                frame,
-                float_image.get_img()
-                if not flip
-                else cv.flip(float_image.get_img(), 1),
-                (x, y),
-            )
+        return True
 
-        else:
-            w, h = float_image.get_width(), float_image.get_height()
+    def _preview_resize(self, img):
+        # Resizes the image by maintaining the aspect ratio by determining what is
+        # the percentage of the height relative to the original height in pixels.
+        # And then multiplying the original the original width to that percentage.
+        base_height = CAPTURE_HEIGHT
+        height_percent = base_height / float(img.shape[0])
+        width = int((float(img.shape[1]) * float(height_percent)))
+
+        # Downscale into a few reused buffers; the Tk thread may still be
+        # showing the previous one while the next is written.
+        self._preview_buffer_index = (self._preview_buffer_index + 1) % len(
+            self._preview_buffers
+        )
+        buffer = self._preview_buffers[self._preview_buffer_index]
+
+        if buffer is None or buffer.shape != (base_height, width, img.shape[2]):
+            buffer = np.empty((base_height, width, img.shape[2]), dtype=img.dtype)
+            self._preview_buffers[self._preview_buffer_index] = buffer
 
-            frame[y : y + h, x : x + w] = (
-                float_image.get_img() if not flip else cv.flip(float_image.get_img(), 1)
+        return cv.resize(
+            img, (width, base_height), dst=buffer, interpolation=cv.INTER_AREA
+        )
+
+    def _frame_prepare(self, frame):
+        """Mirrors a captured BGR frame and converts it to RGB, the working
+        colour space of the whole pipeline.
+
+        Arguments:
+            frame: Captured BGR frame, converted in place.
+
+        Return:
+            Mirrored RGB frame.
+        """
+        return mirror_to_rgb(frame)
+
+    def _check_gestures(self, frame, hands_list, pre_processed_hands_list):
+        # Classify every hand once; the result is reused for "the other hand".
+        with self._stats.time("classify"):
+            gestures, _ = self._gesture_classifier.classify(pre_processed_hands_list)
+
+        self._gesture_handler.apply(frame, self._scene, hands_list, gestures)
+
+    def _import_image(self, path):
+        """Adds an imported image to the scene once it's decoded, which
+        happens off the Tk thread since imports can be large photos.
+
+        Arguments:
+            path: Path of the image.
+        """
+        cap_w = self._cap.get_width()
+
+        def load():
+            # Float images never get wider than the frame, so larger images
+            # are decoded at a reduced scale and only kept at that width.
+            float_image = FloatImage(
+                path,
+                cap_w=cap_w,
+                interpolation=self._overlay_interpolation,
+                max_width=cap_w,
             )
 
-        return frame
+            with self._scene_lock:
+                self._scene.add(float_image)
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def _apply_quality(self, settings):
+        """Applies a quality level chosen by the quality controller.
+
+        Arguments:
+            settings: Settings of the quality level.
+        """
+        self._hand_detector.configure(
+            detection_width=settings["detection_width"],
+            model_complexity=settings["model_complexity"],
+            max_num_hands=settings["max_num_hands"],
+        )
+        self._preview_interval = settings["preview_interval"]
+        self._overlay_interpolation = settings["interpolation"]
+
+        with self._scene_lock:
+            for float_image in self._scene:
+                float_image.set_interpolation(self._overlay_interpolation)
+
+    def _scene_draw(self, frame):
+        return self._compositor.draw_scene(frame, self._scene)
 
     def _set_appwindow(self):
         hwnd = windll.user32.GetParent(self.winfo_id())
@@ -487,13 +552,15 @@ class App(tk.Tk):
                     success = self._cap.get_success()
 
                     if success:
-                        self._float_images.append(
-                            FloatImage(
-                                path,
-                                cap_w=self._cap.get_width(),
-                            )
+                        float_image = FloatImage(
+                            path,
+                            cap_w=self._cap.get_width(),
+                            interpolation=self._overlay_interpolation,
                         )
 
+                        with self._scene_lock:
+                            self._scene.add(float_image)
+
                 for i in range(imgs_count):
                     thumbnail, path = category_imgs[i]
                     btn = tk.Label(
@@ -550,12 +617,7 @@ class App(tk.Tk):
                     ]:
                         return
 
-                    self._float_images.append(
-                        FloatImage(
-                            path.name,
-                            cap_w=self._cap.get_width(),
-                        )
-                    )
+                    self._import_image(path.name)
 
                     return
 
@@ -663,7 +725,7 @@ class App(tk.Tk):
 
         # Initialize settings button.
         def _btn_settings__click():
-            self._win_settings = ToplevelWindow(self, "Settings", 372, 144)
+            self._win_settings = ToplevelWindow(self, "Settings", 372, 181)
 
             def ts__click(switch):
                 if getattr(self, f"_{switch}"):
@@ -752,6 +814,30 @@ class App(tk.Tk):
                 "<Button-1>", lambda _: ts__click("hand_landmarks")
             )
 
+            # Initialize frame stats toggle switch.
+            tk.Label(
+                self._win_settings,
+                text="Frame Stats",
+                font="Consolas 16",
+                fg=COLOR_WHITE,
+                bg=COLOR_GRAY,
+                bd=0,
+            ).place(x=14, y=141)
+
+            self._win_settings._ts_frame_stats = tk.Label(
+                self._win_settings,
+                image=ts__set_switch("frame_stats"),
+                bg=COLOR_GRAY,
+                cursor="hand2",
+            )
+
+            self._win_settings._ts_frame_stats.place(
+                w=42, h=21, x=372 - 42 - 16, y=144
+            )
+            self._win_settings._ts_frame_stats.bind(
+                "<Button-1>", lambda _: ts__click("frame_stats")
+            )
+
         self._btn_settings = tk.Label(
             self, image=self._img_cog, bg=COLOR_GRAY, cursor="hand2"
         )
@@ -767,19 +853,71 @@ class App(tk.Tk):
             y=128,
         )
 
-    def _init_variables(self, cam, cap_src):
+    def _init_variables(self, cam, cap_src, stats_path, detector_process):
         self._virtual_cam = cam
         self._cap_src = cap_src
         self._width = 816
         self._height = 581
-        self._cap = Capture(self._cap_src)
-        self._hand_detector = HandDetector()
+        self._cap = Capture(self._cap_src, threaded=True, loop=True)
+        fps = self._cap.get_fps()
+        detector_kwargs = dict(
+            detection_width=DETECTION_WIDTH,
+            roi_tracking=DETECTION_ROI_TRACKING,
+            adaptive=DETECTION_ADAPTIVE,
+            frame_budget=1 / fps if fps > 0 else None,
+        )
+        self._hand_detector = (
+            HandDetectorProcess(
+                max_latency=DETECTION_PROCESS_LATENCY / (fps if fps > 0 else 30),
+                **detector_kwargs,
+            )
+            if detector_process
+            else HandDetector(**detector_kwargs)
+        )
         self._gesture_classifier = GestureClassifier()
+        self._gesture_handler = GestureHandler(self._hand_detector)
+        self._compositor = Compositor(workers=COMPOSITOR_WORKERS)
+        self._stats = FrameStats(export_path=stats_path)
+        self._sender = VirtualCamSender(self._virtual_cam, self._stats)
+        self._stats.set_info("output", self._sender.get_stats)
+        self._stats.set_info("assets", asset_cache.get_stats)
         self._win_dragging = False
         self._cam_preview = True
         self._gesture_control = True
         self._hand_landmarks = False
-        self._float_images = []
+        self._frame_stats = False
+        self._scene = Scene()
+        self._scene_lock = threading.Lock()
+        self._cap_detected = True
+        self._hand_seen_time = time.perf_counter()
+        self._probe_time = 0.0
+        self._detect_cost = 0.0
+        self._preview_interval = PREVIEW_INTERVAL
+        self._preview_time = 0.0
+        # One buffer being shown, one waiting in the output queue and one
+        # being written.
+        self._preview_buffers = [None] * 3
+        self._preview_buffer_index = 0
+        self._preview_item = None
+        self._preview_text = None
+        self._preview_photo = None
+        self._overlay_interpolation = cv.INTER_AREA
+        self._quality = (
+            QualityController(
+                frame_budget=1 / fps if fps > 0 else 1 / 30,
+                apply=self._apply_quality,
+            )
+            if QUALITY_ADAPTIVE
+            else None
+        )
+
+        if self._quality is not None:
+            self._stats.set_info("quality", self._quality.get_stats)
+        self._pipeline = Pipeline(
+            self._pipeline_capture,
+            [self._pipeline_detect, self._pipeline_compose],
+            queue_size=PIPELINE_QUEUE_SIZE,
+        )
         self._img_minimize = tk.PhotoImage(file=PATH_ICONS + "minimize.png")
         self._img_close = tk.PhotoImage(file=PATH_ICONS + "close.png")
         self._img_cog = tk.PhotoImage(file=PATH_ICONS + "cog.png")
@@ -825,6 +963,15 @@ class App(tk.Tk):
                     pi_img = ImageTk.PhotoImage(img)
                     getattr(self, f"_imgs_{category}").append([pi_img, filepath])
 
+    def destroy(self):
+        self._pipeline.stop()
+        self._sender.stop()
+        self._cap.release()
+        self._hand_detector.close()
+        self._compositor.close()
+
+        tk.Tk.destroy(self)
+
     def is_dragging(self):
         return self._win_dragging
 
@@ -922,16 +1069,32 @@ class ToplevelWindow(tk.Toplevel):
         self._img_close = self._parent._img_close
 
 
-def getWebcamProperties():
-    cap = Capture(0)
+def getWebcamProperties(cap_src=0):
+    cap = Capture(cap_src)
+    properties = cap.get_width(), cap.get_height(), cap.get_fps()
+    cap.release()
 
-    return cap.get_width(), cap.get_height(), cap.get_fps()
+    return properties
 
 
 def main():
-    width, height, fps = getWebcamProperties()
-    with pyvirtualcam.Camera(width=width, height=height, fps=fps) as cam:
-        app = App(cam)
+    # Setting FLOAT_SOURCE picks the capture source: a camera index, a video
+    # file, a directory of images or "synthetic".
+    cap_src = os.environ.get("FLOAT_SOURCE", "0")
+    cap_src = int(cap_src) if cap_src.isdigit() else cap_src
+
+    width, height, fps = getWebcamProperties(cap_src)
+    with pyvirtualcam.Camera(
+        width=width, height=height, fps=fps, fmt=pyvirtualcam.PixelFormat.RGB
+    ) as cam:
+        # Setting FLOAT_STATS to a file path exports the frame statistics,
+        # setting FLOAT_DETECTOR_PROCESS runs the hand detector in its own process.
+        app = App(
+            cam,
+            cap_src=cap_src,
+            stats_path=os.environ.get("FLOAT_STATS"),
+            detector_process=bool(os.environ.get("FLOAT_DETECTOR_PROCESS")),
+        )
         app.mainloop()
 
 
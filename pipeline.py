@@ -0,0 +1,214 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Marker passed down the stages after the source's last item.
+_END = object()
+
+
+class DropQueue:
+    def __init__(self, maxsize=2, blocking=False):
+        """Initializes a bounded queue that drops its oldest item when full.
+
+        Arguments:
+            maxsize: Maximum number of items kept in the queue.
+            blocking: Wait for room instead of dropping the oldest item.
+        """
+        self._items = deque(maxlen=maxsize)
+        self._blocking = blocking
+        self._cond = threading.Condition()
+        self._dropped = 0
+
+    def put(self, item, timeout=None):
+        """Adds an item, waiting up to the timeout for room if the queue
+        blocks.
+
+        Return:
+            Whether the item was added.
+        """
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                if not self._blocking:
+                    self._dropped += 1
+                elif not self._cond.wait_for(
+                    lambda: len(self._items) < self._items.maxlen, timeout
+                ):
+                    return False
+
+            self._items.append(item)
+            self._cond.notify_all()
+
+            return True
+
+    def get(self, timeout=None):
+        """Takes the oldest item, waiting for one up to the timeout.
+
+        Return:
+            Item, or None if the queue stayed empty.
+        """
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+
+            if not self._items:
+                return None
+
+            item = self._items.popleft()
+            self._cond.notify_all()
+
+            return item
+
+    def get_latest(self):
+        """Takes the newest item without waiting, discarding older ones.
+
+        Return:
+            Item, or None if the queue is empty.
+        """
+        with self._cond:
+            if not self._items:
+                return None
+
+            self._dropped += len(self._items) - 1
+            item = self._items.pop()
+            self._items.clear()
+            self._cond.notify_all()
+
+            return item
+
+    def get_dropped(self):
+        return self._dropped
+
+
+class Pipeline:
+    def __init__(self, source, stages, queue_size=2, blocking=False):
+        """Initializes a pipeline that runs each stage on its own thread.
+
+        Consecutive stages are connected by bounded queues that drop their
+        oldest item when a stage falls behind, so a slow stage never makes
+        the ones before it wait.
+
+        Arguments:
+            source: Callable producing the next item, or None if there is none.
+            stages: Callables each taking an item from the previous stage and
+            returning the item for the next one, or None to drop it.
+            queue_size: Size of the queues between the stages.
+            blocking: Make a stage wait for the next one instead of dropping
+            items, for sources where every item must be processed.
+        """
+        self._source = source
+        self._stages = stages
+        self._queues = [DropQueue(queue_size, blocking) for _ in stages]
+        self._output = DropQueue(1)
+        self._errors = 0
+        self._running = False
+        self._ending = False
+        self._drained = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._running = True
+        self._ending = False
+        self._drained.clear()
+
+        outputs = self._queues + [self._output]
+
+        self._threads = [
+            threading.Thread(
+                target=self._run_source, args=(outputs[0],), daemon=True
+            )
+        ]
+
+        for i, stage in enumerate(self._stages):
+            self._threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(stage, self._queues[i], outputs[i + 1]),
+                    daemon=True,
+                )
+            )
+
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+        self._threads = []
+
+    def _call(self, function, *args):
+        """Calls a source or stage, logging and dropping the item if it
+        raises, so one bad item doesn't stop its thread."""
+        try:
+            return function(*args)
+        except Exception:
+            self._errors += 1
+            logger.exception(
+                "Pipeline stage %s failed", getattr(function, "__name__", function)
+            )
+            return None
+
+    def end(self):
+        """Ends the source: it isn't called again, and the items already in
+        the pipeline still go through every stage, see is_drained()."""
+        self._ending = True
+
+    def _put(self, queue, item):
+        # A blocking queue waits for room, but not past stop().
+        while not queue.put(item, timeout=0.1):
+            if not self._running:
+                return
+
+    def _run_source(self, output):
+        while self._running:
+            item = self._call(self._source)
+
+            if item is not None:
+                self._put(output, item)
+
+            if self._ending:
+                self._put(output, _END)
+                return
+
+    def _run_stage(self, stage, input, output):
+        while self._running:
+            item = input.get(timeout=0.1)
+
+            if item is None:
+                continue
+
+            if item is _END:
+                if output is self._output:
+                    self._drained.set()
+                else:
+                    self._put(output, _END)
+
+                return
+
+            item = self._call(stage, item)
+
+            if item is not None:
+                self._put(output, item)
+
+    def get_output(self):
+        """Gets the queue holding the last stage's most recent result."""
+        return self._output
+
+    def get_dropped(self):
+        """Gets the number of items each queue has dropped."""
+        return [queue.get_dropped() for queue in self._queues + [self._output]]
+
+    def get_errors(self):
+        """Gets the number of items dropped because a stage raised."""
+        return self._errors
+
+    def is_drained(self):
+        """Whether every item has gone through the stages since end()."""
+        return self._drained.is_set()
+
+    def is_running(self):
+        return self._running
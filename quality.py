@@ -0,0 +1,163 @@
+import time
+from collections import deque
+import cv2 as cv
+
+# Quality levels, from the best to the cheapest.
+QUALITY_LEVELS = [
+    {
+        "detection_width": 640,
+        "model_complexity": 1,
+        "max_num_hands": 2,
+        "preview_interval": 10,
+        "interpolation": cv.INTER_AREA,
+    },
+    {
+        "detection_width": 480,
+        "model_complexity": 1,
+        "max_num_hands": 2,
+        "preview_interval": 33,
+        "interpolation": cv.INTER_AREA,
+    },
+    {
+        "detection_width": 480,
+        "model_complexity": 0,
+        "max_num_hands": 2,
+        "preview_interval": 33,
+        "interpolation": cv.INTER_LINEAR,
+    },
+    {
+        "detection_width": 320,
+        "model_complexity": 0,
+        "max_num_hands": 2,
+        "preview_interval": 66,
+        "interpolation": cv.INTER_LINEAR,
+    },
+    {
+        "detection_width": 320,
+        "model_complexity": 0,
+        "max_num_hands": 1,
+        "preview_interval": 100,
+        "interpolation": cv.INTER_NEAREST,
+    },
+]
+
+
+class QualityController:
+    def __init__(
+        self,
+        frame_budget,
+        apply,
+        levels=QUALITY_LEVELS,
+        down_threshold=0.9,
+        up_threshold=0.6,
+        down_frames=10,
+        up_frames=90,
+    ):
+        """Initializes a controller that trades quality for frame rate.
+
+        Arguments:
+            frame_budget: Seconds available per frame, usually 1 / fps.
+            apply: Callable applying a quality level, given its settings.
+            levels: Quality levels, from the best to the cheapest.
+            down_threshold: Fraction of the budget above which the frame cost
+            is over budget.
+            up_threshold: Fraction of the budget below which there is enough
+            headroom to raise the quality.
+            down_frames: Consecutive frames over budget before the quality is
+            lowered.
+            up_frames: Consecutive frames with headroom before the quality is
+            raised.
+        """
+        self._frame_budget = frame_budget
+        self._apply = apply
+        self._levels = levels
+        self._down_threshold = down_threshold
+        self._up_threshold = up_threshold
+        self._down_frames = down_frames
+        self._up_frames = up_frames
+
+        self._level = 0
+        self._cost = None
+        self._over = 0
+        self._under = 0
+
+        # Raising the quality right back into overload makes it oscillate;
+        # each step down makes the next step up wait longer.
+        self._up_wait = up_frames
+
+        self._changes = deque(maxlen=20)
+
+    def update(self, frame_cost):
+        """Records the cost of a frame and changes the quality level if needed.
+
+        Arguments:
+            frame_cost: Seconds spent on the frame by the stage the levels
+            make cheaper, the hand detection.
+        """
+        self._cost = (
+            frame_cost if self._cost is None else 0.9 * self._cost + 0.1 * frame_cost
+        )
+
+        if self._cost > self._frame_budget * self._down_threshold:
+            self._over += 1
+            self._under = 0
+        elif self._cost < self._frame_budget * self._up_threshold:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = 0
+            self._under = 0
+
+        if self._over >= self._down_frames and self._level < len(self._levels) - 1:
+            self._up_wait = min(self._up_wait * 2, self._up_frames * 8)
+            self._set_level(
+                self._level + 1,
+                f"frame cost {self._cost * 1000:.1f} ms over "
+                f"{self._down_threshold:.0%} of the "
+                f"{self._frame_budget * 1000:.1f} ms budget",
+            )
+        elif self._under >= self._up_wait and self._level > 0:
+            self._set_level(
+                self._level - 1,
+                f"frame cost {self._cost * 1000:.1f} ms under "
+                f"{self._up_threshold:.0%} of the "
+                f"{self._frame_budget * 1000:.1f} ms budget",
+            )
+
+    def _set_level(self, level, reason):
+        self._changes.append(
+            {"time": time.time(), "from": self._level, "to": level, "reason": reason}
+        )
+
+        # Costs measured at the previous level say nothing about this one.
+        self._level = level
+        self._cost = None
+        self._over = 0
+        self._under = 0
+
+        self._apply(self._levels[level])
+
+    def get_stats(self):
+        """Gets the current quality level and the recent level changes.
+
+        Return:
+            Dictionary of the level, its settings, the smoothed frame cost and
+            budget in milliseconds, and the most recent changes with their
+            reason.
+        """
+        return {
+            "level": self._level,
+            "settings": dict(self._levels[self._level]),
+            "frame_cost": None if self._cost is None else self._cost * 1000,
+            "frame_budget": self._frame_budget * 1000,
+            "changes": list(self._changes),
+        }
+
+    def get_level(self):
+        return self._level
+
+    def get_settings(self):
+        return self._levels[self._level]
+
+    def set_frame_budget(self, seconds):
+        self._frame_budget = seconds
@@ -0,0 +1,369 @@
+import numpy as np
+
+# Side, in pixels, of the cells of the grid indexing the float images.
+GRID_CELL_SIZE = 64
+
+
+class Scene:
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        """Initializes a container of float images in z-order, indexed by a
+        uniform grid so that finding the image under a cursor only looks at
+        the images overlapping the cursor's cell.
+
+        The images' rectangles are kept in compact arrays, so every cursor is
+        tested against its candidates in one vectorised query. The scene
+        reads the images' rectangles when they're added and updated; whoever
+        moves or resizes an image calls update() afterwards. It also records
+        where the static images changed, so the compositor only rebuilds
+        those parts of its cached layer.
+
+        Arguments:
+            cell_size: Side of the grid's cells in pixels.
+        """
+        self._cell_size = cell_size
+
+        # Slots of the images: their rectangle (x0, y0, x1, y1), their
+        # z-order (higher is on top) and the range of cells
+        # (gx0, gy0, gx1, gy1) they're indexed in. Free slots get reused.
+        self._images = []
+        self._slots = {}
+        self._free = []
+        self._rects = np.zeros((0, 4), dtype=np.int32)
+        self._z = np.zeros(0, dtype=np.int64)
+        self._cells = np.zeros((0, 4), dtype=np.int32)
+        self._next_z = 0
+
+        # Grid cell (gx, gy) to the slots of the images overlapping it.
+        self._grid = {}
+
+        # Images from the bottom to the top, rebuilt when the order changes.
+        self._order = []
+        self._order_dirty = False
+
+        # Image each hand is dragging, by handedness.
+        self._dragging = {}
+
+        # Rectangles (x0, y0, x1, y1) where the static images, the ones not
+        # being dragged, changed since the compositor last rebuilt them.
+        self._dirty = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        """Iterates over the images from the bottom to the top."""
+        return iter(self.get_images())
+
+    def __contains__(self, float_image):
+        return id(float_image) in self._slots
+
+    def _rect(self, float_image):
+        x, y = float_image.get_pos_x(), float_image.get_pos_y()
+
+        return (x, y, x + float_image.get_width(), y + float_image.get_height())
+
+    def _cell_range(self, rect):
+        x0, y0, x1, y1 = rect
+        cs = self._cell_size
+
+        return (x0 // cs, y0 // cs, (x1 - 1) // cs, (y1 - 1) // cs)
+
+    def _index(self, slot, cells):
+        gx0, gy0, gx1, gy1 = cells
+
+        for gy in range(gy0, gy1 + 1):
+            for gx in range(gx0, gx1 + 1):
+                self._grid.setdefault((gx, gy), set()).add(slot)
+
+        self._cells[slot] = cells
+
+    def _unindex(self, slot):
+        gx0, gy0, gx1, gy1 = self._cells[slot]
+
+        for gy in range(gy0, gy1 + 1):
+            for gx in range(gx0, gx1 + 1):
+                cell = self._grid.get((gx, gy))
+
+                if cell is not None:
+                    cell.discard(slot)
+
+                    if not cell:
+                        del self._grid[(gx, gy)]
+
+    def add(self, float_image):
+        """Adds a float image on top of the others.
+
+        Arguments:
+            float_image: Float image to add.
+        """
+        if self._free:
+            slot = self._free.pop()
+            self._images[slot] = float_image
+        else:
+            slot = len(self._images)
+            self._images.append(float_image)
+
+            if slot >= len(self._rects):
+                # Grow the arrays geometrically.
+                size = max(2 * len(self._rects), 16)
+                self._rects = np.resize(self._rects, (size, 4))
+                self._z = np.resize(self._z, size)
+                self._cells = np.resize(self._cells, (size, 4))
+
+        rect = self._rect(float_image)
+
+        self._slots[id(float_image)] = slot
+        self._rects[slot] = rect
+        self._z[slot] = self._next_z
+        self._next_z += 1
+        self._index(slot, self._cell_range(rect))
+        self._order_dirty = True
+        self._dirty.append(rect)
+
+    def remove(self, float_image):
+        """Removes a float image.
+
+        Arguments:
+            float_image: Float image to remove.
+        """
+        if not self.is_dragged(float_image):
+            self._dirty.append(tuple(self._rects[self._slots[id(float_image)]]))
+
+        slot = self._slots.pop(id(float_image))
+
+        self._unindex(slot)
+        self._images[slot] = None
+        self._free.append(slot)
+        self._order_dirty = True
+
+        for handedness, dragging in list(self._dragging.items()):
+            if dragging is float_image:
+                del self._dragging[handedness]
+
+    def update(self, float_image):
+        """Updates the index after a float image moved or was resized.
+
+        Arguments:
+            float_image: Float image that changed.
+        """
+        slot = self._slots[id(float_image)]
+        rect = self._rect(float_image)
+        cells = self._cell_range(rect)
+
+        if not self.is_dragged(float_image):
+            self._dirty.append(tuple(self._rects[slot]))
+            self._dirty.append(rect)
+
+        self._rects[slot] = rect
+
+        # Most moves stay within the same cells.
+        if tuple(self._cells[slot]) != cells:
+            self._unindex(slot)
+            self._index(slot, cells)
+
+    def raise_to_top(self, float_image):
+        """Puts a float image on top of the others.
+
+        Arguments:
+            float_image: Float image to raise.
+        """
+        slot = self._slots[id(float_image)]
+
+        self._z[slot] = self._next_z
+        self._next_z += 1
+        self._order_dirty = True
+
+        if not self.is_dragged(float_image):
+            self._dirty.append(tuple(self._rects[slot]))
+
+    def topmost_at(self, cursors):
+        """Finds the topmost float image under each cursor.
+
+        Arguments:
+            cursors: Cursor positions (x, y).
+
+        Return:
+            Topmost float image under each cursor, or None where there is none.
+        """
+        cursors = np.asarray(cursors, dtype=np.int32).reshape(-1, 2)
+        result = [None] * len(cursors)
+
+        # Candidates are the images indexed in each cursor's cell.
+        slots = []
+        owners = []
+
+        for i, (x, y) in enumerate(cursors):
+            cell = self._grid.get((x // self._cell_size, y // self._cell_size))
+
+            if cell:
+                slots.extend(cell)
+                owners.extend([i] * len(cell))
+
+        if not slots:
+            return result
+
+        slots = np.array(slots)
+        owners = np.array(owners)
+        rects = self._rects[slots]
+        points = cursors[owners]
+
+        hit = (
+            (rects[:, 0] < points[:, 0])
+            & (points[:, 0] < rects[:, 2])
+            & (rects[:, 1] < points[:, 1])
+            & (points[:, 1] < rects[:, 3])
+        )
+        slots, owners = slots[hit], owners[hit]
+
+        # The cursors can share cells with images without being over any.
+        if not len(slots):
+            return result
+
+        # Sort the hits by cursor then z-order; each cursor's topmost hit
+        # is the last of its run.
+        order = np.lexsort((self._z[slots], owners))
+        slots, owners = slots[order], owners[order]
+        last = np.append(owners[1:] != owners[:-1], True)
+
+        for owner, slot in zip(owners[last], slots[last]):
+            result[owner] = self._images[slot]
+
+        return result
+
+    def query_rect(self, rect):
+        """Finds the float images overlapping a rectangle.
+
+        Arguments:
+            rect: Rectangle (x0, y0, x1, y1).
+
+        Return:
+            Float images overlapping the rectangle, from the bottom to the top.
+        """
+        x0, y0, x1, y1 = rect
+        gx0, gy0, gx1, gy1 = self._cell_range(rect)
+        slots = set()
+
+        for gy in range(gy0, gy1 + 1):
+            for gx in range(gx0, gx1 + 1):
+                slots.update(self._grid.get((gx, gy), ()))
+
+        if not slots:
+            return []
+
+        slots = np.fromiter(slots, dtype=np.int64)
+        rects = self._rects[slots]
+        slots = slots[
+            (rects[:, 0] < x1)
+            & (x0 < rects[:, 2])
+            & (rects[:, 1] < y1)
+            & (y0 < rects[:, 3])
+        ]
+        slots = slots[np.argsort(self._z[slots])]
+
+        return [self._images[slot] for slot in slots]
+
+    def pop_dirty(self):
+        """Takes the rectangles where the static images changed.
+
+        Return:
+            Rectangles (x0, y0, x1, y1), possibly overlapping.
+        """
+        dirty, self._dirty = self._dirty, []
+
+        return dirty
+
+    def get_static_rects(self):
+        """Gets rectangles covering the images not being dragged, made of the
+        grid cells they occupy merged into as few rectangles as the cells'
+        layout allows.
+
+        Return:
+            Non-overlapping rectangles (x0, y0, x1, y1).
+        """
+        dragged = {self._slots[id(image)] for image in self._dragging.values()}
+        rows = {}
+
+        for (gx, gy), slots in self._grid.items():
+            if not slots <= dragged:
+                rows.setdefault(gy, []).append(gx)
+
+        # Runs of consecutive cells in each row; a run continuing one of
+        # the row above extends it downwards.
+        cells = []
+        open_runs = {}
+        last_gy = None
+
+        for gy in sorted(rows):
+            if last_gy is not None and gy != last_gy + 1:
+                cells.extend((*run, gy0, last_gy) for run, gy0 in open_runs.items())
+                open_runs = {}
+
+            gxs = sorted(rows[gy])
+            runs = []
+            start = gxs[0]
+
+            for prev, gx in zip(gxs, gxs[1:]):
+                if gx != prev + 1:
+                    runs.append((start, prev))
+                    start = gx
+
+            runs.append((start, gxs[-1]))
+
+            continued = {}
+
+            for run in runs:
+                continued[run] = open_runs.pop(run, gy)
+
+            cells.extend((*run, gy0, last_gy) for run, gy0 in open_runs.items())
+            open_runs = continued
+            last_gy = gy
+
+        cells.extend((*run, gy0, last_gy) for run, gy0 in open_runs.items())
+
+        cs = self._cell_size
+
+        return [
+            (gx0 * cs, gy0 * cs, (gx1 + 1) * cs, (gy1 + 1) * cs)
+            for gx0, gx1, gy0, gy1 in cells
+        ]
+
+    def get_dragged_images(self):
+        """Gets the float images being dragged, from the bottom to the top."""
+        images = {id(image): image for image in self._dragging.values()}
+
+        return sorted(images.values(), key=self.get_z)
+
+    def is_dragged(self, float_image):
+        return any(image is float_image for image in self._dragging.values())
+
+    def get_images(self):
+        """Gets the float images from the bottom to the top."""
+        if self._order_dirty:
+            slots = np.fromiter(self._slots.values(), dtype=np.int64)
+            slots = slots[np.argsort(self._z[slots])]
+            self._order = [self._images[slot] for slot in slots]
+            self._order_dirty = False
+
+        return self._order
+
+    def get_z(self, float_image):
+        return int(self._z[self._slots[id(float_image)]])
+
+    def get_dragging(self, handedness):
+        return self._dragging.get(handedness)
+
+    def set_dragging(self, handedness, float_image):
+        previous = self._dragging.pop(handedness, None)
+
+        if float_image is not None:
+            self._dragging[handedness] = float_image
+
+        # An image leaves the static images while it's dragged and joins
+        # them again when it's released.
+        for image in (previous, float_image):
+            if (
+                image is not None
+                and image in self
+                and (image is previous) != (image is float_image)
+            ):
+                self._dirty.append(tuple(self._rects[self._slots[id(image)]]))
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from compositor import Compositor
+from float_image import FloatImage
+from scene import Scene
+
+FRAME_SIZE = (720, 1280)
+
+
+def make_scene(layout):
+    """Builds a scene of overlapping shapes at (x, y, width) positions."""
+    scene = Scene()
+
+    for i, (x, y, width) in enumerate(layout):
+        float_image = FloatImage(
+            f"assets/images/shapes/{i % 10 + 1:03d}.png", cap_w=FRAME_SIZE[1]
+        )
+        float_image.set_img_width(width)
+        float_image.set_pos_x(x)
+        float_image.set_pos_y(y)
+        scene.add(float_image)
+
+    return scene
+
+
+def reference(frame, scene):
+    """Blends the scene's images one by one with straight alpha, in floats."""
+    out = frame.astype(np.float64)
+    frame_h, frame_w = out.shape[:2]
+
+    for float_image in scene:
+        rgba = float_image.img_resize(
+            width=float_image.get_width(),
+            interpolation=float_image.get_interpolation(),
+        ).astype(np.float64)
+        x, y = float_image.get_pos_x(), float_image.get_pos_y()
+        h, w = rgba.shape[:2]
+
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+
+        if x0 >= x1 or y0 >= y1:
+            continue
+
+        src = rgba[y0 - y : y1 - y, x0 - x : x1 - x]
+        alpha = src[:, :, 3:] / 255 if src.shape[2] == 4 else 1
+        roi = out[y0:y1, x0:x1]
+        roi[:] = src[:, :, :3] * alpha + roi * (1 - alpha)
+
+    return np.round(out).astype(np.uint8)
+
+
+def background(seed=0):
+    return np.random.default_rng(seed).integers(
+        0, 256, FRAME_SIZE + (3,), dtype=np.uint8
+    )
+
+
+def assert_close(frame, expected, tolerance=2):
+    assert np.abs(frame.astype(np.int16) - expected).max() <= tolerance
+
+
+LAYOUT = [
+    (-40, -30, 300),
+    (150, 100, 260),
+    (200, 180, 320),
+    (900, 400, 280),
+    (1100, 600, 250),
+    (600, 300, 180),
+]
+
+
+def drag_and_remove(scene):
+    """Steps through dragging, releasing and removing images, yielding after
+    each step."""
+    images = scene.get_images()
+    dragged = images[1]
+
+    scene.set_dragging("Right", dragged)
+    scene.raise_to_top(dragged)
+    yield
+
+    for dx, dy in ((40, 10), (80, 60), (500, 200)):
+        dragged.set_pos_x(dragged.get_pos_x() + dx)
+        dragged.set_pos_y(dragged.get_pos_y() + dy)
+        scene.update(dragged)
+        yield
+
+    scene.set_dragging("Right", None)
+    yield
+
+    scene.remove(images[2])
+    yield
+
+    scene.remove(images[0])
+    yield
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_cached_layer_matches_straight_alpha(workers):
+    scene = make_scene(LAYOUT)
+    compositor = Compositor(workers=workers)
+    base = background()
+
+    try:
+        assert_close(compositor.draw_scene(base.copy(), scene), reference(base, scene))
+
+        for _ in drag_and_remove(scene):
+            assert_close(
+                compositor.draw_scene(base.copy(), scene), reference(base, scene)
+            )
+    finally:
+        compositor.close()
+
+
+def test_tiled_output_is_identical_to_serial():
+    serial_scene = make_scene(LAYOUT)
+    tiled_scene = make_scene(LAYOUT)
+    serial = Compositor(workers=1)
+    tiled = Compositor(workers=4)
+    base = background(1)
+
+    try:
+        steps = zip(drag_and_remove(serial_scene), drag_and_remove(tiled_scene))
+
+        for _ in [None, *steps]:
+            assert np.array_equal(
+                serial.draw_scene(base.copy(), serial_scene),
+                tiled.draw_scene(base.copy(), tiled_scene),
+            )
+    finally:
+        serial.close()
+        tiled.close()
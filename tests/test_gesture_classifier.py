@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from export_gesture_classifier import export
+from gesture_classfier import GestureClassifier, GestureMLP, load_interpreter
+
+MODEL_PATH = "model/gesture_classifier.tflite"
+WEIGHTS_PATH = "model/gesture_classifier.npz"
+
+
+@pytest.fixture(scope="module")
+def interpreter_backend():
+    try:
+        backend, _ = load_interpreter()
+    except ImportError:
+        pytest.skip("no TFLite interpreter installed")
+
+    return backend
+
+
+def random_landmarks(n, seed=0):
+    """Pre-processed landmarks are relative to the wrist and within [-1, 1]."""
+    landmarks = np.random.default_rng(seed).uniform(-1, 1, (n, 42))
+    landmarks[:, :2] = 0
+
+    return landmarks.astype(np.float32)
+
+
+def test_numpy_matches_tflite(interpreter_backend):
+    landmarks = random_landmarks(500)
+    expected, _ = GestureClassifier(MODEL_PATH, backend=interpreter_backend).classify(
+        landmarks
+    )
+    result, _ = GestureClassifier(MODEL_PATH, backend="numpy").classify(landmarks)
+
+    assert np.array_equal(result, expected)
+
+
+# The exporter keeps the intermediate tensors on purpose.
+@pytest.mark.filterwarnings("ignore:.*experimental_preserve_all_tensors")
+def test_exported_weights_match_shipped_weights(interpreter_backend, tmp_path):
+    weights_path = tmp_path / "gesture_classifier.npz"
+
+    # export() itself checks the evaluator against the interpreter.
+    export(MODEL_PATH, str(weights_path), interpreter_backend)
+
+    landmarks = random_landmarks(100, seed=1)
+    exported = GestureMLP(str(weights_path))(landmarks)
+    shipped = GestureMLP(WEIGHTS_PATH)(landmarks)
+
+    assert np.allclose(exported, shipped, atol=1e-5)
+
+
+def test_classify_without_hands():
+    result, probabilities = GestureClassifier(MODEL_PATH, backend="numpy").classify(
+        np.zeros((0, 42), dtype=np.float32)
+    )
+
+    assert result.shape == (0,)
+    assert probabilities.shape[0] == 0
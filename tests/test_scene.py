@@ -0,0 +1,71 @@
+from scene import Scene
+
+
+class Rect:
+    def __init__(self, x, y, width, height):
+        """Stands in for a float image; the scene only reads its rectangle."""
+        self._x, self._y = x, y
+        self._width, self._height = width, height
+
+    def get_pos_x(self):
+        return self._x
+
+    def get_pos_y(self):
+        return self._y
+
+    def get_width(self):
+        return self._width
+
+    def get_height(self):
+        return self._height
+
+
+def test_topmost_at_cursor_in_occupied_cell_outside_every_rect():
+    scene = Scene(cell_size=64)
+    scene.add(Rect(10, 10, 40, 40))
+
+    # Same cell as the image, 3 pixels to its left.
+    assert scene.topmost_at([(7, 20)]) == [None]
+
+
+def test_topmost_at_mixes_hits_and_misses():
+    scene = Scene(cell_size=64)
+    bottom = Rect(10, 10, 40, 40)
+    top = Rect(20, 20, 40, 40)
+    scene.add(bottom)
+    scene.add(top)
+
+    assert scene.topmost_at([(7, 20), (30, 30), (15, 15), (500, 500)]) == [
+        None,
+        top,
+        bottom,
+        None,
+    ]
+
+
+def test_topmost_at_follows_raise_to_top():
+    scene = Scene(cell_size=64)
+    bottom = Rect(10, 10, 40, 40)
+    top = Rect(20, 20, 40, 40)
+    scene.add(bottom)
+    scene.add(top)
+    scene.raise_to_top(bottom)
+
+    assert scene.topmost_at([(30, 30)]) == [bottom]
+
+
+def test_static_rects_cover_only_the_static_images():
+    scene = Scene(cell_size=64)
+    corner = Rect(10, 10, 230, 230)
+    opposite = Rect(1670, 830, 230, 230)
+    dragged = Rect(800, 400, 100, 100)
+
+    for image in (corner, opposite, dragged):
+        scene.add(image)
+
+    scene.set_dragging("Right", dragged)
+
+    assert sorted(scene.get_static_rects()) == [
+        (0, 0, 256, 256),
+        (1664, 768, 1920, 1088),
+    ]
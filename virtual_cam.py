@@ -0,0 +1,104 @@
+import threading
+
+
+class VirtualCamSender:
+    def __init__(self, cam, stats=None):
+        """Initializes a sender that feeds the virtual camera on its own thread.
+
+        The sender is the only user of the camera. It sends the most recent
+        submitted frame at the device's frame rate, so composing a frame never
+        waits on the device: a frame replaced before it was sent is dropped,
+        and the last frame is sent again when no new one arrived in time.
+
+        Arguments:
+            cam: Virtual camera.
+            stats: Frame statistics the send time is recorded in, or None.
+        """
+        self._cam = cam
+        self._stats = stats
+
+        # Single slot holding the most recent frame and its number.
+        self._frame = None
+        self._seq = 0
+        self._sent_seq = 0
+        self._cond = threading.Condition()
+
+        self._delivered = 0
+        self._duplicated = 0
+        self._dropped = 0
+
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+        with self._cond:
+            self._cond.notify()
+
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def submit(self, frame):
+        """Makes a frame the next one sent, replacing any unsent frame.
+
+        Arguments:
+            frame: RGB frame of the virtual camera's size; it must not be
+            modified afterwards.
+        """
+        with self._cond:
+            if self._seq != self._sent_seq:
+                self._dropped += 1
+
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify()
+
+    def _run(self):
+        while self._running:
+            with self._cond:
+                # Nothing to repeat until the first frame arrives.
+                if self._frame is None:
+                    self._cond.wait(timeout=0.1)
+                    continue
+
+                frame, seq = self._frame, self._seq
+
+                if seq == self._sent_seq:
+                    self._duplicated += 1
+                else:
+                    self._delivered += 1
+                    self._sent_seq = seq
+
+            if self._stats is not None:
+                with self._stats.time("send"):
+                    self._cam.send(frame)
+            else:
+                self._cam.send(frame)
+
+            self._cam.sleep_until_next_frame()
+
+    def get_stats(self):
+        """Gets the number of delivered, duplicated and dropped frames.
+
+        Return:
+            Dictionary of the counters.
+        """
+        with self._cond:
+            return {
+                "delivered": self._delivered,
+                "duplicated": self._duplicated,
+                "dropped": self._dropped,
+            }
+
+    def get_fps(self):
+        return self._cam.fps
+
+    def is_running(self):
+        return self._running